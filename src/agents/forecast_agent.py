@@ -8,7 +8,7 @@ from loguru import logger
 from utils.kronos_predictor import KronosPredictorUtility
 from utils.json_utils import extract_json
 from utils.database_manager import DatabaseManager
-from schema.models import ForecastResult, KLinePoint, InvestmentSignal
+from schema.models import ForecastResult, InvestmentSignal, KLINE_POINTS_ADAPTER
 from prompts.forecast_analyst import get_forecast_adjustment_instructions, get_forecast_task
 
 class ForecastAgent:
@@ -20,7 +20,7 @@ class ForecastAgent:
     def __init__(self, db: DatabaseManager, model: Model):
         self.db = db
         self.model = model
-        self.predictor_util = KronosPredictorUtility() # Singleton
+        self._predictor_util: Optional[KronosPredictorUtility] = None
         
         # 调整智能体
         self.adjuster = Agent(
@@ -30,6 +30,13 @@ class ForecastAgent:
             debug_mode=True
         )
 
+    @property
+    def predictor_util(self) -> KronosPredictorUtility:
+        """Kronos 预测器（单例），首次预测时才加载模型，创建智能体本身不再付出加载开销"""
+        if self._predictor_util is None:
+            self._predictor_util = KronosPredictorUtility()
+        return self._predictor_util
+
     def generate_forecast(
         self,
         ticker: str,
@@ -158,7 +165,7 @@ class ForecastAgent:
             # Since we fed the 'News Forecast' into the context, a smart LLM should adopt it.
             
             if adjust_data and "adjusted_forecast" in adjust_data:
-                final_points = [KLinePoint(**p) for p in adjust_data["adjusted_forecast"]]
+                final_points = KLINE_POINTS_ADAPTER.validate_python(adjust_data["adjusted_forecast"])
                 rationale = adjust_data.get("rationale", "LLM subjectively adjusted based on news context.")
                 
                 return ForecastResult(
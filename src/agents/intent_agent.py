@@ -2,7 +2,7 @@ from agno.agent import Agent
 from loguru import logger
 from prompts.intent_agent import get_intent_analysis_instructions, get_intent_task
 from schema.models import IntentAnalysis
-from utils.json_utils import extract_json
+from utils.json_utils import extract_json, parse_model_json
 
 class IntentAgent:
     """意图分析 Agent - 负责解析用户查询意图"""
@@ -32,19 +32,12 @@ class IntentAgent:
             response = self.agent.run(get_intent_task(query))
             content = response.content
             
-            # 使用统一工具提取 JSON
-            result = extract_json(content)            
+            # 优先单遍解析校验纯净 JSON，失败再走鲁棒提取
+            result = parse_model_json(content, IntentAnalysis) or extract_json(content)
             if not result:
                logger.warning("Intent output is not valid JSON, returning raw text in wrapper")
                result = {"intent_summary": content, "search_queries": [query], "is_specific_event": False, "keywords": [], "time_range": "recent"}
 
-            # Optional: Validate against Pydantic model
-            # try:
-            #     obj = IntentAnalysis(**result)
-            #     result = obj.model_dump()
-            # except:
-            #     pass
-
             logger.info(f"👉 Refined Intent: {result.get('intent_summary', 'N/A')}")
             return result
         except Exception as e:
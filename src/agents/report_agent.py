@@ -649,10 +649,10 @@ class ReportAgent:
         返回: [{"theme_title": "主题A", "signal_ids": [1, 2], "rationale": "..."}]
         """
         # 准备简要输入
-        signals_preview = ""
-        for i, s in enumerate(signals, 1):
-            title = s.title if hasattr(s, 'title') else s.get('title', '')
-            signals_preview += f"[{i}] {title}\n"
+        signals_preview = "".join(
+            f"[{i}] {s.title if hasattr(s, 'title') else s.get('title', '')}\n"
+            for i, s in enumerate(signals, 1)
+        )
             
         logger.info(f"🧠 Clustering {len(signals)} signals into themes...")
         
@@ -788,8 +788,9 @@ class ReportAgent:
             logger.info(f"✍️ Writing draft for theme [{i}/{len(clusters)}]: {theme_title} (Signals: {signal_ids})...")
             
             # 聚合该簇下的所有信号内容
-            cluster_signals_text = ""
-            cluster_price_context = ""
+            # 片段先收集到列表，循环结束后一次 join
+            cluster_signal_parts = []
+            cluster_price_parts = []
             cluster_tickers_seen = set()
             
             for sig_idx in signal_ids:
@@ -800,7 +801,7 @@ class ReportAgent:
                 signal = signals[sig_idx-1]
                 
                 # 聚合信号文本
-                cluster_signals_text += format_signal_for_report(signal, sig_idx, cite_keys=signal_to_keys.get(sig_idx, [])) + "\n"
+                cluster_signal_parts.append(format_signal_for_report(signal, sig_idx, cite_keys=signal_to_keys.get(sig_idx, [])) + "\n")
                 
                 # 聚合行情 Context (去重)
                 analysis_text = getattr(signal, 'analysis', '') if not isinstance(signal, dict) else signal.get('analysis', '')
@@ -816,11 +817,14 @@ class ReportAgent:
                             if not df_ctx.empty:
                                 last_5 = df_ctx.tail(5)
                                 prices_str = ", ".join([f"{row['date']}:{row['close']}" for _, row in last_5.iterrows()])
-                                cluster_price_context += f"- {t}: {prices_str}\n"
+                                cluster_price_parts.append(f"- {t}: {prices_str}\n")
                         except Exception as e:
                             logger.debug(f"Failed to get price context for ticker {t}: {e}")
                             continue
 
+            cluster_signals_text = "".join(cluster_signal_parts)
+            cluster_price_context = "".join(cluster_price_parts)
+            
             # 撰写单节草稿 (基于主题)
             writer_instruction = get_report_writer_instructions(
                 theme_title=theme_title,
@@ -1136,6 +1140,9 @@ class ReportAgent:
 
         # Cache rendered forecast HTML per (ticker, pred_len) to guarantee identical output across duplicates
         rendered_forecast_html: Dict[tuple, str] = {}
+        # 替换时只确定文件名并登记待渲染图表，全部代码块处理完后统一批量渲染；
+        # 同名文件以最后一次登记为准，与逐个渲染时后者覆盖前者一致
+        render_jobs: Dict[str, Any] = {}
 
         def replace_match(match):
             json_str = match.group(1).strip()
@@ -1280,7 +1287,7 @@ class ReportAgent:
                             if chart:
                                 timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
                                 filename = f"reports/charts/stock_{ticker}_{timestamp}.html"
-                                VisualizerTools.render_chart_to_file(chart, filename)
+                                render_jobs[filename] = chart
                                 rel_path = f"charts/stock_{ticker}_{timestamp}.html"
                                 all_charts_html.append(
                                     f'<iframe src="{rel_path}" width="100%" height="500px" style="border:none;"></iframe>\n'
@@ -1351,7 +1358,7 @@ class ReportAgent:
                         if chart:
                             timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
                             filename = f"reports/charts/forecast_{ticker}_{timestamp}.html"
-                            VisualizerTools.render_chart_to_file(chart, filename)
+                            render_jobs[filename] = chart
 
                             rel_path = f"charts/forecast_{ticker}_{timestamp}.html"
                             html = (
@@ -1370,7 +1377,7 @@ class ReportAgent:
                     if chart:
                         timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
                         filename = f"reports/charts/stock_{ticker}_{timestamp}.html"
-                        VisualizerTools.render_chart_to_file(chart, filename)
+                        render_jobs[filename] = chart
                         rel_path = f"charts/stock_{ticker}_{timestamp}.html"
                         html = (
                             f'<iframe src="{rel_path}" width="100%" height="500px" style="border:none;"></iframe>\n'
@@ -1445,7 +1452,7 @@ class ReportAgent:
                                 if chart:
                                     timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
                                     filename = f"reports/charts/sentiment_{timestamp}.html"
-                                    VisualizerTools.render_chart_to_file(chart, filename)
+                                    render_jobs[filename] = chart
                                     rel_path = f"charts/sentiment_{timestamp}.html"
                                     return f'\n<iframe src="{rel_path}" width="100%" height="400px" style="border:none;"></iframe>\n<p style="text-align:center;color:gray;font-size:12px">交互式图表: {title}</p>\n'
                         
@@ -1482,7 +1489,7 @@ class ReportAgent:
                             json.dumps(payload, sort_keys=True, ensure_ascii=False).encode("utf-8")
                         ).hexdigest()[:8]
                         filename = f"reports/charts/isq_{timestamp}_{content_hash}.html"
-                        VisualizerTools.render_chart_to_file(chart, filename)
+                        render_jobs[filename] = chart
                         rel_path = f"charts/isq_{timestamp}_{content_hash}.html"
                         return f'\n<iframe src="{rel_path}" width="100%" height="420px" style="border:none;"></iframe>\n<p style="text-align:center;color:gray;font-size:12px">信号质量雷达图: {title}</p>\n'
 
@@ -1538,7 +1545,7 @@ class ReportAgent:
                         if chart:
                             timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
                             filename = f"reports/charts/trans_legacy_{timestamp}_{content_hash}.html"
-                            VisualizerTools.render_chart_to_file(chart, filename)
+                            render_jobs[filename] = chart
                             rel_path = f"charts/trans_legacy_{timestamp}_{content_hash}.html"
                             return f'\n<iframe src="{rel_path}" width="100%" height="420px" style="border:none;"></iframe>\n<p style="text-align:center;color:gray;font-size:12px">逻辑传导拓扑图: {title}</p>\n'
 
@@ -1552,6 +1559,8 @@ class ReportAgent:
         # 匹配 ```json-chart ... ```
         pattern = re.compile(r'```json-chart\s*(\{.*?\})\s*```', re.DOTALL)
         new_content = pattern.sub(replace_match, content)
+        if render_jobs:
+            VisualizerTools.render_many([(chart, filename) for filename, chart in render_jobs.items()])
 
         # Make invalid-forecast-ticker failures visible (older versions emitted HTML comments)
         new_content = re.sub(
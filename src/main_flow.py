@@ -5,12 +5,15 @@ from datetime import datetime
 from typing import List, Dict, Optional, Union, Any
 from loguru import logger
 from dotenv import load_dotenv
+# 先加载 .env：下方 utils/agents 模块在导入时读取环境变量（缓存目录、TTL、情绪模式等）
+load_dotenv()
 
 from utils.database_manager import DatabaseManager
 from utils.llm.factory import get_model
-from utils.llm.router import router
+from utils.llm.router import get_router
 from utils.search_tools import SearchTools
-from utils.json_utils import extract_json
+from utils.json_utils import extract_json, parse_model_json
+from schema.models import FilterResult
 from agents import TrendAgent, FinAgent, ReportAgent, IntentAgent
 from utils.stock_tools import StockTools
 from agno.agent import Agent
@@ -37,6 +40,7 @@ class SignalFluxWorkflow:
         self.db = DatabaseManager(db_path)
         
         # 使用 ModelRouter 获取不同用途的模型
+        router = get_router()
         self.reasoning_model = router.get_reasoning_model()
         self.tool_model = router.get_tool_model()
         
@@ -78,8 +82,8 @@ class SignalFluxWorkflow:
             response = self.filter_agent.run(f"请筛选以下新闻:\n{news_text}")
             content = response.content
             
-            # 提取 JSON
-            result = extract_json(content)
+            # 提取 JSON（优先按 FilterResult 单遍解析校验）
+            result = parse_model_json(content, FilterResult) or extract_json(content)
             
             # 检查是否有有效信号（减少 token 消耗）
             if result and not result.get("has_valid_signals", True):
@@ -1,6 +1,7 @@
 # src/prompts/report_agent.py
 from datetime import datetime
 from typing import Optional
+from pydantic import ValidationError
 from .isq_prompt_generator import generate_isq_prompt_section
 
 def get_report_planner_base_instructions() -> str:
@@ -30,8 +31,9 @@ def format_signal_for_report(signal: any, index: int, cite_keys: Optional[list]
     if isinstance(signal, dict):
         try:
             sig_obj = InvestmentSignal(**signal)
-        except:
-            return f"--- 信号 [{index}] ---\n标题: {signal.get('title')}\n内容: {signal.get('content', '')[:500]}"
+        except (ValidationError, TypeError, KeyError):
+            content = signal.get('content') or ''
+            return f"--- 信号 [{index}] ---\n标题: {signal.get('title')}\n内容: {content[:500]}"
     else:
         sig_obj = signal
 
@@ -5,11 +5,27 @@ ISQ (Investment Signal Quality) 评估框架 Template
 支持默认 template 和自定义 template。
 """
 
-from typing import Dict, List, Any, Optional
-from pydantic import BaseModel, Field
+from typing import Dict, List, Any, Optional, Tuple
+from functools import cached_property
+from pydantic import BaseModel, ConfigDict, Field, field_validator
 from enum import Enum
 from pathlib import Path
-import json
+import os
+import sys
+import textwrap
+
+import numpy as np
+
+try:
+    import orjson as _json
+except ImportError:
+    import json as _json
+
+
+_KEY_INTENSITY = sys.intern("intensity")
+
+# 模板加载后不再修改：嵌套实例不再重复校验/复制
+_SCHEMA_CONFIG = ConfigDict(revalidate_instances='never', validate_assignment=False, extra='ignore')
 
 
 class ISQDimension(str, Enum):
@@ -24,6 +40,8 @@ class ISQDimension(str, Enum):
 
 class ISQDimensionSpec(BaseModel):
     """ISQ 单个维度的定义规范"""
+    model_config = _SCHEMA_CONFIG
+
     name: str = Field(..., description="维度名称")
     key: str = Field(..., description="维度键名")
     description: str = Field(..., description="维度描述")
@@ -32,9 +50,17 @@ class ISQDimensionSpec(BaseModel):
     examples: Dict[str, str] = Field(default_factory=dict, description="不同分值的示例解释")
     visualization_color: Optional[str] = Field(default=None, description="可视化颜色")
 
+    @field_validator("key")
+    @classmethod
+    def _intern_key(cls, v: str) -> str:
+        # 维度键频繁作为 dict key 查找，驻留后哈希比较可走指针相等快路径
+        return sys.intern(v)
+
 
 class ISQTemplate(BaseModel):
     """ISQ 评估框架 Template"""
+    model_config = _SCHEMA_CONFIG
+
     template_id: str = Field(..., description="模板 ID")
     template_name: str = Field(..., description="模板名称")
     description: str = Field(..., description="模板描述")
@@ -52,9 +78,25 @@ class ISQTemplate(BaseModel):
     aggregation_method: str = Field(default="weighted_average", description="聚合方法 (weighted_average, product 等)")
     dimension_weights: Dict[str, float] = Field(default_factory=dict, description="维度权重")
 
+    @field_validator("dimensions", "dimension_weights")
+    @classmethod
+    def _intern_dimension_keys(cls, v: Dict[str, Any]) -> Dict[str, Any]:
+        # 自定义模板的键来自 JSON 解析，不会自动驻留
+        return {sys.intern(k): spec for k, spec in v.items()}
+
+    @cached_property
+    def compiled_weights(self) -> Tuple[Tuple[str, ...], np.ndarray, np.ndarray]:
+        """预编译的聚合参数 (keys, weights, divisor)，强度维度的 divisor 为 5 (1-5 -> 0-1)"""
+        keys = tuple(self.dimension_weights.keys())
+        weights = np.fromiter(self.dimension_weights.values(), dtype=np.float64, count=len(keys))
+        divisor = np.array([5.0 if k == _KEY_INTENSITY else 1.0 for k in keys], dtype=np.float64)
+        return keys, weights, divisor
+
 
 class ISQScore(BaseModel):
     """单个信号的 ISQ 评分结果"""
+    model_config = _SCHEMA_CONFIG
+
     signal_id: str = Field(..., description="信号 ID")
     template_id: str = Field(..., description="使用的模板 ID")
     
@@ -75,6 +117,35 @@ class ISQScore(BaseModel):
 # 默认 Template
 # =====================================================
 
+_DEFAULT_SCORING_GUIDE = textwrap.dedent("""
+    ### ISQ 评分指导 (Investment Signal Quality)
+    
+    ISQ 框架用于多维度评估投资信号的质量。每个信号由 5 个维度组成：
+    
+    1. **情绪 (Sentiment)**: -1.0 到 1.0，表示看空(-)/中性(0)/看多(+)
+    2. **确定性 (Confidence)**: 0.0 到 1.0，数值越高越确定
+    3. **强度 (Intensity)**: 1 到 5，数值越高影响越大
+    4. **预期差 (Expectation Gap)**: 0.0 到 1.0，市场预期与现实的差距
+    5. **时效性 (Timeliness)**: 0.0 到 1.0，反应窗口的紧迫程度
+    
+    ### 综合评分算法
+    
+    综合评分 = 确定性 × 0.35 + 强度/5 × 0.30 + 预期差 × 0.20 + 时效性 × 0.15
+    
+    范围: 0.0 到 1.0
+    - 0.0-0.3: 信号质量较差，不建议跟进
+    - 0.3-0.6: 信号质量一般，可作参考
+    - 0.6-0.8: 信号质量良好，值得跟进
+    - 0.8-1.0: 信号质量优异，强烈推荐
+    
+    ### 评分时的注意事项
+    
+    - **不要混淆方向和强度**：情绪可以是看空，但确定性和强度仍可能很高
+    - **预期差往往是 Alpha 来源**：高预期差 + 高确定性 = 最佳博弈机会
+    - **考虑时间成本**：长期信号需要更高的确定性才值得跟进
+    - **数据为王**：所有评分必须有具体数据支撑
+    """)
+
 DEFAULT_ISQ_TEMPLATE = ISQTemplate(
     template_id="default_isq_v1",
     template_name="标准投资信号质量评估框架 (ISQ v1.0)",
@@ -159,34 +230,7 @@ DEFAULT_ISQ_TEMPLATE = ISQTemplate(
         ),
     },
     
-    scoring_guide="""
-    ### ISQ 评分指导 (Investment Signal Quality)
-    
-    ISQ 框架用于多维度评估投资信号的质量。每个信号由 5 个维度组成：
-    
-    1. **情绪 (Sentiment)**: -1.0 到 1.0，表示看空(-)/中性(0)/看多(+)
-    2. **确定性 (Confidence)**: 0.0 到 1.0，数值越高越确定
-    3. **强度 (Intensity)**: 1 到 5，数值越高影响越大
-    4. **预期差 (Expectation Gap)**: 0.0 到 1.0，市场预期与现实的差距
-    5. **时效性 (Timeliness)**: 0.0 到 1.0，反应窗口的紧迫程度
-    
-    ### 综合评分算法
-    
-    综合评分 = 确定性 × 0.35 + 强度/5 × 0.30 + 预期差 × 0.20 + 时效性 × 0.15
-    
-    范围: 0.0 到 1.0
-    - 0.0-0.3: 信号质量较差，不建议跟进
-    - 0.3-0.6: 信号质量一般，可作参考
-    - 0.6-0.8: 信号质量良好，值得跟进
-    - 0.8-1.0: 信号质量优异，强烈推荐
-    
-    ### 评分时的注意事项
-    
-    - **不要混淆方向和强度**：情绪可以是看空，但确定性和强度仍可能很高
-    - **预期差往往是 Alpha 来源**：高预期差 + 高确定性 = 最佳博弈机会
-    - **考虑时间成本**：长期信号需要更高的确定性才值得跟进
-    - **数据为王**：所有评分必须有具体数据支撑
-    """,
+    scoring_guide=_DEFAULT_SCORING_GUIDE,
     
     applicable_scenarios=[
         "上市公司基本面变化分析",
@@ -317,13 +361,17 @@ def load_templates_from_config(config_path: Optional[str] = None) -> None:
     
     # 如果是目录，扫描所有 .json 文件
     if path.is_dir():
-        json_files = list(path.glob("*.json"))
+        with os.scandir(path) as it:
+            json_files = [
+                Path(entry.path) for entry in it
+                if entry.name.endswith(".json") and entry.is_file()
+            ]
     else:
         json_files = [path]
     
     for json_file in json_files:
         try:
-            data = json.loads(json_file.read_text(encoding="utf-8"))
+            data = _json.loads(json_file.read_bytes())
             
             # 如果是单个模板对象，转为列表
             if isinstance(data, dict):
@@ -367,15 +415,7 @@ def get_isq_scoring_prompt(template_id: str = "default_isq_v1") -> str:
 
 def calculate_isq_overall_score(scores: Dict[str, float], template_id: str = "default_isq_v1") -> float:
     """计算 ISQ 综合评分"""
-    template = get_isq_template(template_id)
-    
-    overall = 0.0
-    for dim_key, weight in template.dimension_weights.items():
-        if dim_key in scores:
-            score = scores[dim_key]
-            # 处理强度维度的特殊缩放 (1-5 -> 0-1)
-            if dim_key == "intensity":
-                score = score / 5.0
-            overall += score * weight
+    keys, weights, divisor = get_isq_template(template_id).compiled_weights
     
-    return min(1.0, max(0.0, overall))  # 限制在 0-1 之间
+    buf = np.fromiter((scores.get(k, 0.0) for k in keys), dtype=np.float64, count=len(keys))
+    return float(np.clip((buf / divisor) @ weights, 0.0, 1.0))  # 限制在 0-1 之间
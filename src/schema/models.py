@@ -1,27 +1,38 @@
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field, TypeAdapter
+from pydantic.dataclasses import dataclass
 from typing import List, Optional, Dict, Any
 from datetime import datetime
 
-class TransmissionNode(BaseModel):
+# 模型在 LLM 构造后即视为不可变：嵌套实例不再重复校验/复制
+_SCHEMA_CONFIG = ConfigDict(revalidate_instances='never', validate_assignment=False, extra='ignore')
+
+class _SchemaModel(BaseModel):
+    model_config = _SCHEMA_CONFIG
+
+# 内部高频构造的轻量结构使用 slots dataclass；作为 Agent output_schema 的模型保持 BaseModel
+_DATACLASS_CONFIG = ConfigDict(arbitrary_types_allowed=True, **_SCHEMA_CONFIG)
+
+@dataclass(slots=True, config=_DATACLASS_CONFIG)
+class TransmissionNode:
     node_name: str = Field(..., description="产业链节点名称")
     impact_type: str = Field(..., description="利好/利空/中性")
     logic: str = Field(..., description="该节点的传导逻辑")
 
-class IntentAnalysis(BaseModel):
+class IntentAnalysis(_SchemaModel):
     keywords: List[str] = Field(..., description="核心实体、事件或概念关键词")
     search_queries: List[str] = Field(..., description="优化后的搜索引擎查询词")
     is_specific_event: bool = Field(..., description="是否查询特定突发事件")
     time_range: str = Field(..., description="时间范围 (recent/all/specific_date)")
     intent_summary: str = Field(..., description="一句话意图描述")
 
-class FilterResult(BaseModel):
+class FilterResult(_SchemaModel):
     """LLM 筛选结果 - 快速判断是否有有效信号"""
     has_valid_signals: bool = Field(..., description="列表中是否包含有效的金融信号")
     selected_ids: List[int] = Field(default_factory=list, description="筛选出的有效信号 ID 列表")
     themes: List[str] = Field(default_factory=list, description="信号涉及的主题")
     reason: Optional[str] = Field(default=None, description="如果无有效信号，说明原因")
 
-class InvestmentSignal(BaseModel):
+class InvestmentSignal(_SchemaModel):
     # 核心元数据
     signal_id: str = Field(default="unknown_sig", description="唯一信号 ID")
     title: str = Field(..., description="信号标题")
@@ -50,7 +61,7 @@ class InvestmentSignal(BaseModel):
     # 溯源
     sources: List[Dict[str, str]] = Field(default_factory=list, description="来源详情 (包含 title, url, source_name)")
 
-class ResearchContext(BaseModel):
+class ResearchContext(_SchemaModel):
     """研究员搜集的背景信息结构"""
     raw_signal: str = Field(..., description="原始信号内容")
     tickers_found: List[Dict[str, Any]] = Field(default_factory=list, description="找到的相关标的及其基本面/股价信息")
@@ -59,7 +70,7 @@ class ResearchContext(BaseModel):
     key_risks: List[str] = Field(default_factory=list, description="潜在风险点")
     search_results_summary: str = Field(..., description="搜索结果的综合摘要")
 
-class ScanContext(BaseModel):
+class ScanContext(_SchemaModel):
     """扫描员搜集的原始数据结构"""
     hot_topics: List[str] = Field(..., description="当前市场热点话题")
     news_summaries: List[Dict[str, Any]] = Field(..., description="关键新闻摘要列表")
@@ -67,16 +78,17 @@ class ScanContext(BaseModel):
     sentiment_overview: str = Field(..., description="整体市场情绪概览")
     raw_data_summary: str = Field(..., description="原始数据的综合摘要")
 
-class SignalCluster(BaseModel):
+class SignalCluster(_SchemaModel):
     theme_title: str = Field(..., description="主题名称")
     signal_ids: List[int] = Field(..., description="包含的信号 ID 列表")
     rationale: str = Field(..., description="聚类理由")
 
-class ClusterContext(BaseModel):
+class ClusterContext(_SchemaModel):
     """信号聚类结果结构"""
     clusters: List[SignalCluster] = Field(..., description="聚类列表")
 
-class KLinePoint(BaseModel):
+@dataclass(slots=True, config=_DATACLASS_CONFIG)
+class KLinePoint:
     date: str = Field(..., description="日期")
     open: float = Field(..., description="开盘价")
     high: float = Field(..., description="最高价")
@@ -84,14 +96,20 @@ class KLinePoint(BaseModel):
     close: float = Field(..., description="收盘价")
     volume: float = Field(..., description="成交量")
 
-class ForecastResult(BaseModel):
+# 模块级预构建的批量校验器：一次 C 层遍历构造整列 KLinePoint，替代逐个 KLinePoint(**d)
+KLINE_POINTS_ADAPTER = TypeAdapter(List[KLinePoint])
+
+class ForecastResult(_SchemaModel):
     ticker: str = Field(..., description="股票代码")
     base_forecast: List[KLinePoint] = Field(default_factory=list, description="Kronos 模型原始预测")
     adjusted_forecast: List[KLinePoint] = Field(default_factory=list, description="LLM 调整后的预测")
     rationale: str = Field(default="", description="预测调整理由及逻辑说明")
     timestamp: str = Field(default_factory=lambda: datetime.now().strftime("%Y-%m-%d %H:%M:%S"), description="生成时间")
 
-class InvestmentReport(BaseModel):
+class InvestmentReport(_SchemaModel):
+    # 仅在运行末尾组装报告时用到，推迟到首次实例化/校验时再构建校验器，缩短冷启动
+    model_config = ConfigDict(defer_build=True, **_SCHEMA_CONFIG)
+
     overall_sentiment: str = Field(..., description="整体市场情绪评价")
     market_entropy: float = Field(..., description="市场分歧度 (0-1, 1代表极高分歧)")
     signals: List[InvestmentSignal] = Field(..., description="深度解析的投资信号列表")
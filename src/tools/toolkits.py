@@ -2,11 +2,20 @@
 AlphaEar 工具包层 - Agno Toolkit 适配器
 复用 utils 中的底层工具实现，提供 Agno Agent 兼容的 Toolkit 接口
 """
+import heapq
+from collections import defaultdict
 from datetime import datetime
-from typing import Optional
+from functools import lru_cache
+from typing import Dict, Optional
+import numpy as np
 from agno.tools import Toolkit
 from loguru import logger
 
+try:
+    import ahocorasick
+except ImportError:
+    ahocorasick = None
+
 from utils.database_manager import DatabaseManager
 from utils.news_tools import NewsNowTools, PolymarketTools
 from utils.stock_tools import StockTools
@@ -59,13 +68,11 @@ class NewsToolkit(Toolkit):
             return f"获取 {source_id} 热点失败"
         
         source_name = self._sources.get(source_id, source_id)
-        result = f"## {source_name} 热点 (获取时间: {datetime.now().strftime('%Y-%m-%d %H:%M')})\n\n"
-        
-        for item in items:
-            result += f"{item['rank']}. {item['title']}\n   链接: {item['url']}\n\n"
+        parts = [f"## {source_name} 热点 (获取时间: {datetime.now().strftime('%Y-%m-%d %H:%M')})\n\n"]
+        parts.extend(f"{item['rank']}. {item['title']}\n   链接: {item['url']}\n\n" for item in items)
         
         logger.info(f"✅ [TOOL SUCCESS] Got {len(items)} news items from {source_id}")
-        return result
+        return "".join(parts)
 
     def fetch_news_content(self, url: str) -> str:
         """
@@ -118,21 +125,17 @@ class NewsToolkit(Toolkit):
         if not items_without_content:
             return "没有需要补充内容的新闻"
         
-        updated_count = 0
-        cursor = self._news_tools.db.conn.cursor()
-        
-        for item in items_without_content[:limit]:
-            url = item.get('url')
-            if url:
-                content = self._news_tools.fetch_news_content(url)
-                if content:
-                    cursor.execute(
-                        "UPDATE daily_news SET content = ? WHERE id = ?",
-                        (content[:10000], item['id'])
-                    )
-                    updated_count += 1
-        
-        self._news_tools.db.conn.commit()
+        # 先并发抓取所有正文，再一次性批量写库
+        targets = [item for item in items_without_content[:limit] if item.get('url')]
+        contents = self._news_tools.fetch_news_contents([item['url'] for item in targets])
+        
+        updates = [
+            (content[:10000], item['id'])
+            for item, content in zip(targets, contents)
+            if content
+        ]
+        self._news_tools.db.update_news_contents(updates)
+        updated_count = len(updates)
         logger.info(f"✅ [TOOL SUCCESS] Enriched {updated_count} news items with content")
         
         return f"✅ 已为 {updated_count} 条新闻补充正文内容"
@@ -176,24 +179,24 @@ class PolymarketToolkit(Toolkit):
         if not markets:
             return "❌ 无法获取 Polymarket 数据（可能是网络问题）"
         
-        result = f"## 🔮 Polymarket 热门预测 (共 {len(markets)} 个)\n\n"
+        parts = [f"## 🔮 Polymarket 热门预测 (共 {len(markets)} 个)\n\n"]
         for i, m in enumerate(markets[:limit], 1):
             question = m.get("question", "Unknown")
             prices = m.get("outcomePrices", [])
             volume = m.get("volume", 0)
             
-            result += f"{i}. **{question}**\n"
+            parts.append(f"{i}. **{question}**\n")
             if prices:
-                result += f"   概率: {prices}\n"
+                parts.append(f"   概率: {prices}\n")
             if volume:
                 try:
-                    result += f"   交易量: ${float(volume):,.0f}\n"
-                except:
-                    result += f"   交易量: {volume}\n"
-            result += "\n"
+                    parts.append(f"   交易量: ${float(volume):,.0f}\n")
+                except (TypeError, ValueError):
+                    parts.append(f"   交易量: {volume}\n")
+            parts.append("\n")
         
         logger.info(f"✅ [TOOL SUCCESS] Got {len(markets)} prediction markets")
-        return result
+        return "".join(parts)
     
     def get_market_summary(self, limit: int = 10) -> str:
         """
@@ -260,10 +263,9 @@ class StockToolkit(Toolkit):
         if not results:
             return f"未找到匹配 '{query}' 的股票"
         
-        output = f"## 股票搜索结果 (关键词: {query})\n\n"
-        for r in results:
-            output += f"- {r['code']} - {r['name']}\n"
-        return output
+        parts = [f"## 股票搜索结果 (关键词: {query})\n\n"]
+        parts.extend(f"- {r['code']} - {r['name']}\n" for r in results)
+        return "".join(parts)
 
     def get_stock_price(self, ticker: str, days: int = 30) -> str:
         """
@@ -286,8 +288,13 @@ class StockToolkit(Toolkit):
             return f"未能获取 {ticker} 的股价数据"
         
 
-        latest = df.iloc[-1]
-        change = ((latest['close'] - df.iloc[0]['close']) / df.iloc[0]['close']) * 100
+        # 直接在 NumPy 数组上取首尾与极值，避免逐行构造 Series
+        closes = df['close'].to_numpy(dtype=float)
+        dates = df['date'].to_numpy()
+        latest_close = closes[-1]
+        change = ((latest_close - closes[0]) / closes[0]) * 100
+        high_max = np.nanmax(df['high'].to_numpy(dtype=float))
+        low_min = np.nanmin(df['low'].to_numpy(dtype=float))
         
         # 格式化历史数据供 LLM 分析 (取最近 15 天)
         history_df = df.tail(15).copy()
@@ -304,10 +311,10 @@ class StockToolkit(Toolkit):
              history_str = history_df[history_cols].to_string(index=False)
 
         return f"""## {ticker} 价格走势 ({days}天)
-- 当前价: ¥{latest['close']:.2f}
+- 当前价: ¥{latest_close:.2f}
 - 期间涨跌: {change:+.2f}%
-- 最高/最低: ¥{df['high'].max():.2f} / ¥{df['low'].min():.2f}
-- 数据范围: {df.iloc[0]['date']} -> {latest['date']}
+- 最高/最低: ¥{high_max:.2f} / ¥{low_min:.2f}
+- 数据范围: {dates[0]} -> {dates[-1]}
 
 ### 最近 15 个交易日详细数据 (OHLCV):
 {history_str}
@@ -446,7 +453,10 @@ class ContextSearchToolkit(Toolkit):
         self._store[doc_id] = {
             "title": title,
             "content": content,
-            "summary": summary or content[:200] + "..."
+            "summary": summary or content[:200] + "...",
+            # 入库时预先 casefold，避免每次查询重复转换
+            "title_cf": title.casefold(),
+            "content_cf": content.casefold(),
         }
         logger.info(f"📄 Added document to context store: {doc_id} - {title[:30]}...")
     
@@ -455,6 +465,37 @@ class ContextSearchToolkit(Toolkit):
         self._store.clear()
         logger.info("🗑️ Context store cleared")
     
+    @staticmethod
+    @lru_cache(maxsize=256)
+    def _query_terms(query: str) -> tuple:
+        """解析查询词（casefold + 空白切分，丢弃空串），按查询串缓存"""
+        return tuple(t for t in query.casefold().split() if t)
+
+    @staticmethod
+    @lru_cache(maxsize=64)
+    def _build_automaton(terms: frozenset):
+        """为查询词构建 Aho-Corasick 自动机（按词集缓存）"""
+        automaton = ahocorasick.Automaton()
+        for term in terms:
+            automaton.add_word(term, term)
+        automaton.make_automaton()
+        return automaton
+
+    @staticmethod
+    def _count_non_overlapping(automaton, text: str) -> Dict[str, int]:
+        """
+        统计各查询词在 text 中不重叠的出现次数，与 str.count 语义一致（"aa" 在 "aaaa" 中计 2 次）
+        
+        automaton.iter 按结束位置报告全部（含重叠的）匹配；同一词的匹配若起点落在上一次计数匹配之内则跳过。
+        """
+        counts: Dict[str, int] = defaultdict(int)
+        last_end: Dict[str, int] = {}
+        for end, term in automaton.iter(text):
+            if end - len(term) >= last_end.get(term, -1):
+                counts[term] += 1
+                last_end[term] = end
+        return counts
+
     def search_context(self, query: str, max_results: int = 3) -> str:
         """
         在已存储的文档中搜索与查询相关的内容片段。
@@ -472,39 +513,44 @@ class ContextSearchToolkit(Toolkit):
             return "⚠️ 上下文存储为空，无可搜索内容。"
         
         # 简单的关键词匹配 + 计分
-        query_terms = query.lower().split()
+        query_terms = self._query_terms(query)
         results = []
+        automaton = self._build_automaton(frozenset(query_terms)) if ahocorasick and query_terms else None
         
         for doc_id, doc in self._store.items():
             score = 0
-            content_lower = doc["content"].lower()
-            title_lower = doc["title"].lower()
+            content_cf = doc["content_cf"]
+            title_cf = doc["title_cf"]
+            
+            # 单次扫描正文统计所有查询词的出现次数
+            if automaton is not None:
+                counts = self._count_non_overlapping(automaton, content_cf)
+            else:
+                counts = {term: content_cf.count(term) for term in query_terms}
             
             for term in query_terms:
                 # 标题匹配权重更高
-                if term in title_lower:
+                if term in title_cf:
                     score += 3
-                if term in content_lower:
-                    score += content_lower.count(term)
+                score += counts.get(term, 0)
             
             if score > 0:
                 results.append((score, doc_id, doc))
         
-        # 按分数排序
-        results.sort(key=lambda x: x[0], reverse=True)
-        results = results[:max_results]
+        # 按分数取 Top-K（与 sorted(..., reverse=True)[:k] 等价，大文档库下免全量排序）
+        results = heapq.nlargest(max_results, results, key=lambda x: x[0])
         
         if not results:
             return f"未找到与 '{query}' 相关的内容。"
         
-        output = f"## 搜索结果 (查询: {query})\n\n"
+        parts = [f"## 搜索结果 (查询: {query})\n\n"]
         for score, doc_id, doc in results:
-            output += f"### [{doc_id}] {doc['title']}\n"
+            parts.append(f"### [{doc_id}] {doc['title']}\n")
             # 返回摘要而非全文，节省 token
-            output += f"{doc['summary']}\n\n"
+            parts.append(f"{doc['summary']}\n\n")
         
         logger.info(f"✅ [TOOL SUCCESS] Found {len(results)} matching documents")
-        return output
+        return "".join(parts)
     
     def get_toc(self) -> str:
         """
@@ -518,9 +564,8 @@ class ContextSearchToolkit(Toolkit):
         if not self._store:
             return "⚠️ 上下文存储为空。"
         
-        output = "## 文档目录 (TOC)\n\n"
-        for doc_id, doc in self._store.items():
-            output += f"- **[{doc_id}]** {doc['title']}\n"
+        parts = ["## 文档目录 (TOC)\n\n"]
+        parts.extend(f"- **[{doc_id}]** {doc['title']}\n" for doc_id, doc in self._store.items())
         
-        return output
+        return "".join(parts)
 
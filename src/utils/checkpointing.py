@@ -1,33 +1,105 @@
+import codecs
 import json
+import math
 import os
 import tempfile
 from dataclasses import dataclass
-from typing import Any, Optional
+from typing import Any, BinaryIO, Callable, Dict, Optional, Set, Tuple
 
 from loguru import logger
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+_WRITE_BUFFER_SIZE = 1 << 20
+
+# 已确认存在的目录，避免每次写入都调用 makedirs
+_ensured_dirs: Set[str] = set()
+
 
 def _atomic_write_text(path: str, content: str, encoding: str = "utf-8") -> None:
-    os.makedirs(os.path.dirname(path), exist_ok=True)
-    fd, tmp_path = tempfile.mkstemp(prefix=".tmp_", dir=os.path.dirname(path))
+    _atomic_write_bytes(path, content.encode(encoding))
+
+
+def _atomic_write_bytes(path: str, content: bytes) -> None:
+    _atomic_write(path, lambda f: f.write(content))
+
+
+def _atomic_write(path: str, write: Callable[[BinaryIO], Any]) -> None:
+    dirname = os.path.dirname(path)
+    if dirname not in _ensured_dirs:
+        os.makedirs(dirname, exist_ok=True)
+        _ensured_dirs.add(dirname)
     try:
-        with os.fdopen(fd, "w", encoding=encoding) as f:
-            f.write(content)
+        fd, tmp_path = tempfile.mkstemp(prefix=".tmp_", dir=dirname)
+    except FileNotFoundError:
+        # 目录在缓存后被删除，重建一次
+        _ensured_dirs.discard(dirname)
+        os.makedirs(dirname, exist_ok=True)
+        _ensured_dirs.add(dirname)
+        fd, tmp_path = tempfile.mkstemp(prefix=".tmp_", dir=dirname)
+    try:
+        with os.fdopen(fd, "wb", buffering=_WRITE_BUFFER_SIZE) as f:
+            write(f)
         os.replace(tmp_path, path)
     finally:
+        # os.replace 成功后临时文件已不存在，直接 unlink（EAFP），FileNotFoundError 属于 OSError
         try:
-            if os.path.exists(tmp_path):
-                os.remove(tmp_path)
+            os.unlink(tmp_path)
         except OSError:
             pass
 
 
+def _json_default(obj: Any) -> Any:
+    """与标准库 default=str 对齐：float 子类（如 np.float64）标准库原生按数值输出，其余非原生类型转 str"""
+    if isinstance(obj, float):
+        return float(obj)
+    return str(obj)
+
+
+def _finite_or_none(obj: Any) -> Any:
+    """把 NaN/±Infinity 替换为 None，使标准库输出与 orjson 一致（均写为 null，且为合法 JSON）"""
+    if isinstance(obj, float):
+        return obj if math.isfinite(obj) else None
+    if isinstance(obj, dict):
+        return {k: _finite_or_none(v) for k, v in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [_finite_or_none(v) for v in obj]
+    return obj
+
+
 def _atomic_write_json(path: str, data: Any) -> None:
-    content = json.dumps(data, ensure_ascii=False, indent=2, default=str)
-    _atomic_write_text(path, content)
+    # 两条路径输出同一格式：datetime/dataclass/numpy 等非原生类型统一按 str() 落盘，NaN/Infinity 写为 null
+    if orjson is not None:
+        content = orjson.dumps(
+            data,
+            option=(
+                orjson.OPT_INDENT_2
+                | orjson.OPT_NON_STR_KEYS
+                | orjson.OPT_PASSTHROUGH_DATETIME
+                | orjson.OPT_PASSTHROUGH_DATACLASS
+            ),
+            default=_json_default,
+        )
+        _atomic_write_bytes(path, content)
+    else:
+        # 流式编码写入，避免先拼出完整的 str 再编码
+        def write(f: BinaryIO) -> None:
+            json.dump(_finite_or_none(data), codecs.getwriter("utf-8")(f), ensure_ascii=False, indent=2, default=str)
+        _atomic_write(path, write)
 
 
 def _read_json(path: str) -> Any:
+    if orjson is not None:
+        with open(path, "rb") as f:
+            raw = f.read()
+        try:
+            return orjson.loads(raw)
+        except orjson.JSONDecodeError:
+            # 旧版本以标准库写出的检查点可能含 NaN 字面量，orjson 不接受
+            return json.loads(raw)
     with open(path, "r", encoding="utf-8") as f:
         return json.load(f)
 
@@ -85,14 +157,23 @@ class CheckpointManager:
             return default
 
 
+# {base_dir: (st_mtime_ns, latest_run_id)}，目录内容变化时 mtime 随之更新
+_latest_cache: Dict[str, Tuple[int, Optional[str]]] = {}
+
+
 def resolve_latest_run_id(checkpoint_base_dir: str) -> Optional[str]:
     try:
-        if not os.path.isdir(checkpoint_base_dir):
-            return None
-        candidates = [d for d in os.listdir(checkpoint_base_dir) if os.path.isdir(os.path.join(checkpoint_base_dir, d))]
-        if not candidates:
+        try:
+            mtime_ns = os.stat(checkpoint_base_dir).st_mtime_ns
+        except FileNotFoundError:
             return None
-        candidates.sort(reverse=True)
-        return candidates[0]
+        cached = _latest_cache.get(checkpoint_base_dir)
+        if cached is not None and cached[0] == mtime_ns:
+            return cached[1]
+        # scandir 直接返回 d_type，无需对每个条目再 stat
+        with os.scandir(checkpoint_base_dir) as it:
+            latest = max((entry.name for entry in it if entry.is_dir()), default=None)
+        _latest_cache[checkpoint_base_dir] = (mtime_ns, latest)
+        return latest
     except Exception:
         return None
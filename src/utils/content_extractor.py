@@ -1,11 +1,17 @@
 import requests
+from requests.adapters import HTTPAdapter
 from requests.exceptions import RequestException, Timeout, ConnectionError
+import hashlib
 import os
 import time
 import json
 import threading
-from typing import Optional
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
 from loguru import logger
+from utils.checkpointing import _atomic_write_text
 
 
 class ContentExtractor:
@@ -18,58 +24,76 @@ class ContentExtractor:
     _rate_window = 60.0  # 时间窗口（秒）
     _min_interval = 3.0  # 请求最小间隔（秒）
     
-    # 类级别的速率限制状态
-    _request_times = []
-    _last_request_time = 0.0
+    # 类级别的速率限制状态 (time.monotonic() 时间戳)
+    _request_times = deque(maxlen=_rate_limit_no_key)  # 最近 N 次请求的放行时刻
+    _last_request_time = float("-inf")
     _lock = threading.Lock()
+    
+    # 正文磁盘缓存：重复 URL（重跑、重试、多源重叠）不再请求 Jina
+    _cache_dir = Path(os.getenv("JINA_CACHE_DIR", "data/jina_cache"))
+    _cache_ttl = float(os.getenv("JINA_CACHE_TTL", "86400"))
+    
+    # 同步请求共享的连接池会话：并发抽取时复用到 r.jina.ai 的 TCP/TLS 连接
+    _session = requests.Session()
+    _session.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=16))
 
     @classmethod
-    def _wait_for_rate_limit(cls, has_api_key: bool) -> None:
-        """等待以满足速率限制要求"""
+    def _cache_path(cls, url: str) -> Path:
+        return cls._cache_dir / hashlib.blake2b(url.encode("utf-8"), digest_size=16).hexdigest()
+
+    @classmethod
+    def _cache_get(cls, url: str) -> Optional[str]:
+        """读取未过期的缓存正文，未命中返回 None"""
+        path = cls._cache_path(url)
+        try:
+            if time.time() - path.stat().st_mtime > cls._cache_ttl:
+                return None
+            return path.read_text(encoding="utf-8")
+        except OSError:
+            return None
+
+    @classmethod
+    def _cache_put(cls, url: str, content: Optional[str]) -> None:
+        if not content:
+            return
+        try:
+            _atomic_write_text(str(cls._cache_path(url)), content)
+        except OSError as e:
+            logger.warning(f"Failed to write Jina cache for {url}: {e}")
+
+    @classmethod
+    def _reserve_rate_limit_slot(cls, has_api_key: bool) -> float:
+        """预占一次请求名额，返回需要等待的秒数"""
         if has_api_key:
             # 有 API Key 时，只需保持最小间隔
-            time.sleep(0.5)
-            return
+            return 0.5
         
+        # 在锁内只计算本次请求的放行时刻并预占名额，锁外 sleep，避免串行化所有线程
         with cls._lock:
-            current_time = time.time()
+            next_allowed = max(time.monotonic(), cls._last_request_time + cls._min_interval)
             
-            # 1. 清理过期的请求记录
-            cls._request_times = [t for t in cls._request_times if current_time - t < cls._rate_window]
-            
-            # 2. 检查是否达到速率限制
+            # 窗口内名额已满时，需等待最旧的请求移出窗口
             if len(cls._request_times) >= cls._rate_limit_no_key:
-                # 需要等待最旧的请求过期
-                oldest = cls._request_times[0]
-                wait_time = cls._rate_window - (current_time - oldest) + 1.0
-                if wait_time > 0:
-                    logger.warning(f"⏳ Jina rate limit reached, waiting {wait_time:.1f}s...")
-                    time.sleep(wait_time)
-                    current_time = time.time()
-                    cls._request_times = [t for t in cls._request_times if current_time - t < cls._rate_window]
-            
-            # 3. 确保请求间隔不太快
-            time_since_last = current_time - cls._last_request_time
-            if time_since_last < cls._min_interval:
-                sleep_time = cls._min_interval - time_since_last
-                time.sleep(sleep_time)
+                next_allowed = max(next_allowed, cls._request_times[0] + cls._rate_window)
             
-            # 4. 记录本次请求
-            cls._request_times.append(time.time())
-            cls._last_request_time = time.time()
+            cls._request_times.append(next_allowed)
+            cls._last_request_time = next_allowed
+        
+        wait_time = next_allowed - time.monotonic()
+        if wait_time > cls._min_interval:
+            logger.warning(f"⏳ Jina rate limit reached, waiting {wait_time:.1f}s...")
+        return max(0.0, wait_time)
 
     @classmethod
-    def extract_with_jina(cls, url: str, timeout: int = 30) -> Optional[str]:
-        """
-        使用 Jina Reader 提取网页正文内容 (Markdown 格式)
-        
-        无 API Key 时自动限速：每分钟最多 20 次请求，每次间隔至少 3 秒
-        """
-        if not url or not url.startswith("http"):
-            return None
-            
-        logger.info(f"🕸️ Extracting content from: {url} via Jina...")
-        
+    def _wait_for_rate_limit(cls, has_api_key: bool) -> None:
+        """等待以满足速率限制要求"""
+        wait_time = cls._reserve_rate_limit_slot(has_api_key)
+        if wait_time > 0:
+            time.sleep(wait_time)
+
+    @staticmethod
+    def _build_headers() -> Tuple[Dict[str, str], bool]:
+        """构造 Jina 请求头，返回 (headers, has_api_key)"""
         headers = {
             "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/131.0.0.0 Safari/537.36",
             "Accept": "application/json"
@@ -81,6 +105,38 @@ class ContentExtractor:
         
         if has_api_key:
             headers["Authorization"] = f"Bearer {api_key}"
+        return headers, has_api_key
+
+    @staticmethod
+    def _parse_response(response) -> Optional[str]:
+        """解析 Jina 200 响应"""
+        try:
+            data = response.json()
+            # Jina JSON 响应格式通常在 data.content
+            if isinstance(data, dict) and "data" in data:
+                return data["data"].get("content", "")
+            return data.get("content", response.text)
+        except (json.JSONDecodeError, TypeError, AttributeError):
+            return response.text
+
+    @classmethod
+    def extract_with_jina(cls, url: str, timeout: int = 30) -> Optional[str]:
+        """
+        使用 Jina Reader 提取网页正文内容 (Markdown 格式)
+        
+        无 API Key 时自动限速：每分钟最多 20 次请求，每次间隔至少 3 秒
+        """
+        if not url or not url.startswith("http"):
+            return None
+            
+        cached = cls._cache_get(url)
+        if cached is not None:
+            logger.info(f"⚡ Using cached Jina content for: {url}")
+            return cached
+            
+        logger.info(f"🕸️ Extracting content from: {url} via Jina...")
+        
+        headers, has_api_key = cls._build_headers()
         
         # 等待速率限制
         cls._wait_for_rate_limit(has_api_key)
@@ -88,17 +144,12 @@ class ContentExtractor:
         try:
             # Jina Reader API
             full_url = f"{cls.JINA_BASE_URL}{url}"
-            response = requests.get(full_url, headers=headers, timeout=timeout)
+            response = cls._session.get(full_url, headers=headers, timeout=timeout)
             
             if response.status_code == 200:
-                try:
-                    data = response.json()
-                    # Jina JSON 响应格式通常在 data.content
-                    if isinstance(data, dict) and "data" in data:
-                        return data["data"].get("content", "")
-                    return data.get("content", response.text)
-                except (json.JSONDecodeError, TypeError):
-                    return response.text
+                content = cls._parse_response(response)
+                cls._cache_put(url, content)
+                return content
             elif response.status_code == 429:
                 # 触发速率限制，等待后重试一次
                 logger.warning(f"⚠️ Jina rate limit (429), waiting 60s before retry...")
@@ -120,3 +171,18 @@ class ContentExtractor:
         except Exception as e:
             logger.error(f"Unexpected error during Jina extraction: {e}")
             return None
+
+    @classmethod
+    def extract_batch(cls, urls: List[str], timeout: int = 30, max_workers: int = 8) -> List[str]:
+        """
+        以线程池并发提取多个 URL 的正文，结果与 urls 一一对应（空 URL 或失败为空串）
+        
+        批量抽取的唯一入口：不依赖事件循环，可在已有运行中事件循环的线程里调用；
+        请求共享 _session 连接池，速率限制与 extract_with_jina 共享
+        """
+        if not urls:
+            return []
+        with ThreadPoolExecutor(max_workers=min(len(urls), max_workers)) as executor:
+            return list(executor.map(
+                lambda url: (cls.extract_with_jina(url, timeout) or "") if url else "", urls
+            ))
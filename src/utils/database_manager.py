@@ -1,25 +1,272 @@
+import calendar
 import sqlite3
-import json
+import threading
+import weakref
 from datetime import datetime, date
 from pathlib import Path
-from typing import List, Dict, Optional, Any, Union
+from typing import List, Dict, Iterator, Optional, Any, Set, Union
 import pandas as pd
 from loguru import logger
+from utils.json_utils import _dumps, _loads
+
+
+def _date_to_epoch(value: Any) -> int:
+    """
+    日期（'YYYY-MM-DD'、'YYYYMMDD'、ISO 时间串或 date/datetime）转为当日 0 点的 UTC 秒级时间戳，
+    与 SQLite strftime('%s', ...) 一致；无法解析时抛出 ValueError
+    """
+    ts = pd.Timestamp(value)
+    if pd.isna(ts):
+        raise ValueError(f"Invalid date: {value!r}")
+    return calendar.timegm(ts.date().timetuple())
+
+
+_SIGNAL_COLUMNS = (
+    'signal_id', 'title', 'summary', 'transmission_chain', 'sentiment_score',
+    'confidence', 'intensity', 'expected_horizon', 'price_in_status',
+    'impact_tickers', 'industry_tags', 'sources', 'user_id', 'created_at',
+)
+_SIGNAL_JSON_FIELDS = ('transmission_chain', 'impact_tickers', 'industry_tags', 'sources')
+# json_object(...) 参数：JSON 字段合法时内嵌为 JSON 值，否则保留原字符串
+_SIGNAL_JSON_OBJECT_ARGS = ", ".join(
+    f"'{col}', CASE WHEN json_valid({col}) THEN json({col}) ELSE {col} END"
+    if col in _SIGNAL_JSON_FIELDS else f"'{col}', {col}"
+    for col in _SIGNAL_COLUMNS
+)
+# impact_tickers 元素通常为 {"ticker": ..., "name": ..., "weight": ...}，兼容直接存代码字符串的旧数据；
+# 非法 JSON 视为空列表，避免 json_each 报错中断整条查询
+_IMPACT_TICKER_EXPR = (
+    "CASE WHEN NOT json_valid({col}) THEN NULL"
+    " WHEN json_type({col}, '$[0]') = 'object' THEN json_extract({col}, '$[0].ticker')"
+    " ELSE json_extract({col}, '$[0]') END"
+)
+_SIGNAL_TICKER_FILTER = """
+    EXISTS (
+        SELECT 1 FROM json_each(CASE WHEN json_valid(impact_tickers) THEN impact_tickers ELSE '[]' END)
+        WHERE CASE type WHEN 'object' THEN json_extract(value, '$.ticker') ELSE value END = ?
+    )
+"""
+
+
+# 热路径 SQL 提升为模块级常量：sqlite3 按 SQL 文本缓存已编译语句（cached_statements），
+# 固定文本保证每次调用都命中缓存，免去重复 prepare
+_INSERT_NEWS_SQL = """
+    INSERT OR REPLACE INTO daily_news 
+    (id, source, rank, title, url, content, publish_time, crawl_time, sentiment_score, meta_data)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+_SELECT_NEWS_SQL = "SELECT * FROM daily_news WHERE crawl_time >= ? ORDER BY crawl_time DESC, rank LIMIT ?"
+_SELECT_NEWS_BY_SOURCE_SQL = (
+    "SELECT * FROM daily_news WHERE crawl_time >= ? AND source = ? ORDER BY crawl_time DESC, rank LIMIT ?"
+)
+# update_news_content 按 (是否更新 content, 是否更新 analysis) 选用预置语句
+_UPDATE_NEWS_SQL = {
+    (True, False): "UPDATE daily_news SET content = ? WHERE id = ?",
+    (False, True): "UPDATE daily_news SET analysis = ? WHERE id = ?",
+    (True, True): "UPDATE daily_news SET content = ?, analysis = ? WHERE id = ?",
+}
+_INSERT_SEARCH_CACHE_SQL = """
+    INSERT OR REPLACE INTO search_cache (query_hash, query, engine, results, timestamp)
+    VALUES (?, ?, ?, ?, ?)
+"""
+_INSERT_SEARCH_DETAIL_SQL = """
+    INSERT OR REPLACE INTO search_detail
+    (id, query_hash, rank, title, url, content, publish_time, crawl_time, sentiment_score, source, meta_data)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+_INSERT_STOCK_PRICES_SQL = """
+    INSERT OR REPLACE INTO stock_prices 
+    (ticker, date, open, close, high, low, volume, change_pct)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+"""
+_SELECT_STOCK_PRICES_SQL = """
+    SELECT p.ticker, strftime('%Y-%m-%d', p.date, 'unixepoch') AS date,
+           p.open, p.close, p.high, p.low, p.volume, p.change_pct
+    FROM stock_prices p
+    WHERE p.ticker = ? AND p.date >= ? AND p.date <= ?
+    ORDER BY p.date
+"""
+_INSERT_SIGNAL_SQL = """
+    INSERT OR REPLACE INTO signals 
+    (signal_id, title, summary, transmission_chain, sentiment_score, 
+     confidence, intensity, expected_horizon, price_in_status, 
+     impact_tickers, industry_tags, sources, user_id, created_at)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+
+class _ReaderHolder:
+    """线程本地的只读连接容器；随线程本地数据一起被回收时触发 finalize 关闭连接"""
+    __slots__ = ("conn", "__weakref__")
+
+    def __init__(self, conn: sqlite3.Connection):
+        self.conn = conn
+
+
+def _release_reader(readers: Set[sqlite3.Connection], lock: threading.Lock, conn: sqlite3.Connection):
+    """关闭已结束线程的只读连接并从登记集合中移除（close() 已关闭时重复关闭无副作用）"""
+    with lock:
+        readers.discard(conn)
+    conn.close()
+
 
 class DatabaseManager:
     """
     AlphaEar 数据库管理器 - 负责存储热点数据、搜索缓存和股价数据
     使用 SQLite 进行持久化存储
+    
+    连接以 WAL + synchronous=NORMAL 模式打开：提交时不再逐次 fsync，读写互不阻塞。
+    代价是进程/系统崩溃时可能丢失最后几次提交（数据库本身不会损坏），
+    对可重新抓取的新闻、缓存与行情数据可以接受。
     """
     
+    # 连接级 PRAGMA：WAL 日志、NORMAL 同步、内存临时表、256MB mmap、64MB 页缓存、5s 忙等待；
+    # recursive_triggers 使 INSERT OR REPLACE 隐式删除旧行时也触发 FTS 同步触发器
+    _PRAGMAS = (
+        "PRAGMA journal_mode=WAL",
+        "PRAGMA synchronous=NORMAL",
+        "PRAGMA temp_store=MEMORY",
+        "PRAGMA mmap_size=268435456",
+        "PRAGMA cache_size=-65536",
+        "PRAGMA busy_timeout=5000",
+        "PRAGMA recursive_triggers=ON",
+    )
+    
+    # trigram 分词器按 3 字符切片建索引，查询串不足 3 个字符时无法命中，回退 LIKE
+    _FTS_MIN_QUERY_LEN = 3
+    
     def __init__(self, db_path: str = "data/signal_flux.db"):
         self.db_path = Path(db_path)
         self.db_path.parent.mkdir(parents=True, exist_ok=True)
-        self.conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
-        self.conn.row_factory = sqlite3.Row
+        # self.conn 为共享的写连接；读操作走 _reader 的线程本地只读连接
+        self.conn = self._connect()
+        self._local = threading.local()
+        self._readers: Set[sqlite3.Connection] = set()
+        self._readers_lock = threading.Lock()
+        # 共享写连接上的事务不能跨线程交错（如多源并发抓取后同时落库），写入时串行
+        self._write_lock = threading.Lock()
         self._init_db()
         logger.info(f"💾 Database initialized at {self.db_path}")
 
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(str(self.db_path), check_same_thread=False, cached_statements=256)
+        conn.row_factory = sqlite3.Row
+        self._apply_pragmas(conn)
+        return conn
+
+    @classmethod
+    def _apply_pragmas(cls, conn: sqlite3.Connection):
+        """应用连接级性能参数"""
+        for pragma in cls._PRAGMAS:
+            conn.execute(pragma)
+
+    @property
+    def _reader(self) -> sqlite3.Connection:
+        """
+        当前线程的只读连接（懒创建，query_only）
+        
+        WAL 模式下读连接读取已提交快照，不阻塞写入，也不与其他线程争用写连接。
+        连接挂在线程本地的 _ReaderHolder 上：线程结束、线程本地数据被回收时由 weakref.finalize 关闭，
+        线程池中的短命线程不会遗留连接与文件句柄。内存数据库无法跨连接共享，直接返回写连接。
+        """
+        if str(self.db_path) == ":memory:":
+            return self.conn
+        holder = getattr(self._local, "reader", None)
+        if holder is None:
+            conn = self._connect()
+            conn.execute("PRAGMA query_only=1")
+            holder = _ReaderHolder(conn)
+            with self._readers_lock:
+                self._readers.add(conn)
+            # 回调不引用 self，避免 finalizer 延长 DatabaseManager 的生命周期
+            weakref.finalize(holder, _release_reader, self._readers, self._readers_lock, conn)
+            self._local.reader = holder
+        return holder.conn
+
+    # 当前表结构版本，记录在 PRAGMA user_version 中
+    _SCHEMA_VERSION = 4
+    
+    # 小行 + 天然主键、从不按 rowid 访问的表使用 WITHOUT ROWID，主键查找少一次 rowid 回表
+    _STOCK_PRICES_DDL = """
+        CREATE TABLE IF NOT EXISTS stock_prices (
+            ticker TEXT,
+            date INTEGER,
+            open REAL,
+            close REAL,
+            high REAL,
+            low REAL,
+            volume REAL,
+            change_pct REAL,
+            PRIMARY KEY (ticker, date)
+        ) WITHOUT ROWID
+    """
+    
+    _STOCK_LIST_DDL = """
+        CREATE TABLE IF NOT EXISTS stock_list (
+            code TEXT PRIMARY KEY,
+            name TEXT
+        ) WITHOUT ROWID
+    """
+
+    def _column_type(self, table: str, column: str) -> Optional[str]:
+        """返回表中列的声明类型，表或列不存在时返回 None（含生成列）"""
+        for row in self.conn.execute(f"PRAGMA table_xinfo({table})"):
+            if row["name"] == column:
+                return row["type"].upper()
+        return None
+
+    def _table_sql(self, table: str) -> Optional[str]:
+        """返回建表语句，表不存在时返回 None"""
+        row = self.conn.execute("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = ?", (table,)).fetchone()
+        return row["sql"] if row else None
+
+    def _rebuild_table(self, table: str, ddl: str, select_cols: str = "*", where: str = ""):
+        """按新 DDL 重建表并拷贝旧数据（需在 _migrate 的事务内调用）"""
+        old = f"_{table}_old"
+        self.conn.execute(f"ALTER TABLE {table} RENAME TO {old}")
+        self.conn.execute(ddl)
+        self.conn.execute(f"INSERT OR REPLACE INTO {table} SELECT {select_cols} FROM {old} {where}")
+        self.conn.execute(f"DROP TABLE {old}")
+
+    def _migrate(self):
+        """按 PRAGMA user_version 执行一次性结构迁移（单事务，失败回滚）"""
+        version = self.conn.execute("PRAGMA user_version").fetchone()[0]
+        if version >= self._SCHEMA_VERSION:
+            return
+        
+        try:
+            self.conn.execute("BEGIN")
+            # v1: stock_prices.date 由 TEXT 改为 INTEGER 时间戳
+            if version < 1 and self._column_type("stock_prices", "date") == "TEXT":
+                logger.info("🔧 Migrating stock_prices.date to INTEGER epoch...")
+                self._rebuild_table(
+                    "stock_prices", self._STOCK_PRICES_DDL,
+                    "ticker, CAST(strftime('%s', date) AS INTEGER), open, close, high, low, volume, change_pct",
+                    "WHERE strftime('%s', date) IS NOT NULL",
+                )
+            # v2: stock_prices / stock_list 改为 WITHOUT ROWID
+            if version < 2:
+                for table, ddl in (("stock_prices", self._STOCK_PRICES_DDL), ("stock_list", self._STOCK_LIST_DDL)):
+                    sql = self._table_sql(table)
+                    if sql and "WITHOUT ROWID" not in sql.upper():
+                        logger.info(f"🔧 Rebuilding {table} as WITHOUT ROWID...")
+                        self._rebuild_table(table, ddl)
+            # v3: signals 增加首个受影响代码的生成列（VIRTUAL，ALTER TABLE 不支持添加 STORED 列）
+            if version < 3 and self._column_type("signals", "first_ticker") is None:
+                expr = _IMPACT_TICKER_EXPR.format(col="impact_tickers")
+                self.conn.execute(f"ALTER TABLE signals ADD COLUMN first_ticker TEXT GENERATED ALWAYS AS ({expr}) VIRTUAL")
+            # v4: 早期库缺少的 daily_news.analysis 与 signals.user_id 列（原先每次启动都尝试 ALTER）
+            if version < 4:
+                for table, column in (("daily_news", "analysis"), ("signals", "user_id")):
+                    if self._column_type(table, column) is None:
+                        logger.info(f"🔧 Adding {table}.{column} column...")
+                        self.conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} TEXT")
+            self.conn.execute(f"PRAGMA user_version = {self._SCHEMA_VERSION}")
+            self.conn.commit()
+        except sqlite3.Error:
+            self.conn.rollback()
+            raise
+
     def _init_db(self):
         """初始化表结构"""
         cursor = self.conn.cursor()
@@ -40,12 +287,6 @@ class DatabaseManager:
                 meta_data TEXT
             )
         """)
-        
-        # 尝试添加 analysis 列（如果表已存在但没有该列）
-        try:
-            cursor.execute("ALTER TABLE daily_news ADD COLUMN analysis TEXT")
-        except:
-            pass  # 列已存在
 
         
         # 2. 搜索缓存表 (原有 JSON 缓存)
@@ -77,28 +318,11 @@ class DatabaseManager:
             )
         """)
         
-        # 3. 股价数据表
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS stock_prices (
-                ticker TEXT,
-                date TEXT,
-                open REAL,
-                close REAL,
-                high REAL,
-                low REAL,
-                volume REAL,
-                change_pct REAL,
-                PRIMARY KEY (ticker, date)
-            )
-        """)
+        # 3. 股价数据表 (date 为当日 0 点 UTC 秒级时间戳，范围查询走整数比较)
+        cursor.execute(self._STOCK_PRICES_DDL)
         
         # 4. 股票列表表 (用于检索)
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS stock_list (
-                code TEXT PRIMARY KEY,
-                name TEXT
-            )
-        """)
+        cursor.execute(self._STOCK_LIST_DDL)
         
         # 5. 投资信号表 (ISQ Framework)
         cursor.execute("""
@@ -141,41 +365,94 @@ class DatabaseManager:
             )
         """)
         
+        self._migrate()
+        
         # 6. 创建索引以优化查询性能
-        cursor.execute("CREATE INDEX IF NOT EXISTS idx_news_crawl_time ON daily_news(crawl_time)")
+        # crawl_time 降序在前：get_daily_news 的时间过滤与 ORDER BY crawl_time DESC 都走索引
+        cursor.execute("DROP INDEX IF EXISTS idx_news_crawl_time")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_news_crawl ON daily_news(crawl_time DESC, source, rank)")
         cursor.execute("CREATE INDEX IF NOT EXISTS idx_news_source ON daily_news(source)")
         cursor.execute("CREATE INDEX IF NOT EXISTS idx_search_cache_timestamp ON search_cache(timestamp)")
         cursor.execute("CREATE INDEX IF NOT EXISTS idx_stock_prices_ticker_date ON stock_prices(ticker, date)")
-        # 尝试添加 user_id 列到 signals 表
-        try:
-            cursor.execute("ALTER TABLE signals ADD COLUMN user_id TEXT")
-        except:
-            pass
-            
         cursor.execute("CREATE INDEX IF NOT EXISTS idx_signals_user_id ON signals(user_id)")
+        # get_recent_signals 按 created_at 倒序取最近 N 条（可按 user_id 过滤）
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_signals_created ON signals(created_at DESC)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_signals_user_created ON signals(user_id, created_at DESC)")
+        # get_signals_for_ticker(primary_only=True) 按首个受影响代码查找
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_signals_first_ticker ON signals(first_ticker, created_at DESC)")
+        # get_search_cache 按 query_hash 取明细并 ORDER BY rank，免临时排序 B 树
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_detail_hash_rank ON search_detail(query_hash, rank)")
+        
+        # 7. 全文索引 (替代 LIKE '%q%' 全表扫描)
+        self._fts = self._init_fts(cursor)
             
         self.conn.commit()
         
         # 初始化邀请码
         self._ensure_invitation_code()
 
+    def _init_fts(self, cursor) -> bool:
+        """
+        创建 trigram FTS5 索引：news_fts 以 daily_news 为外部内容表并由触发器同步，
+        stock_list_fts 随 save_stock_list 整表重建。trigram 保持 LIKE 的任意子串匹配语义，
+        中文无需分词。SQLite 未编译 FTS5 或版本低于 3.34（无 trigram）时返回 False，检索回退 LIKE。
+        """
+        try:
+            has_news_fts = self._table_sql("news_fts") is not None
+            has_stock_fts = self._table_sql("stock_list_fts") is not None
+            
+            cursor.execute("""
+                CREATE VIRTUAL TABLE IF NOT EXISTS news_fts USING fts5(
+                    title, content, content='daily_news', content_rowid='rowid', tokenize='trigram'
+                )
+            """)
+            cursor.execute("""
+                CREATE TRIGGER IF NOT EXISTS daily_news_fts_ai AFTER INSERT ON daily_news BEGIN
+                    INSERT INTO news_fts(rowid, title, content) VALUES (new.rowid, new.title, new.content);
+                END
+            """)
+            cursor.execute("""
+                CREATE TRIGGER IF NOT EXISTS daily_news_fts_ad AFTER DELETE ON daily_news BEGIN
+                    INSERT INTO news_fts(news_fts, rowid, title, content) VALUES ('delete', old.rowid, old.title, old.content);
+                END
+            """)
+            cursor.execute("""
+                CREATE TRIGGER IF NOT EXISTS daily_news_fts_au AFTER UPDATE OF title, content ON daily_news BEGIN
+                    INSERT INTO news_fts(news_fts, rowid, title, content) VALUES ('delete', old.rowid, old.title, old.content);
+                    INSERT INTO news_fts(rowid, title, content) VALUES (new.rowid, new.title, new.content);
+                END
+            """)
+            cursor.execute("CREATE VIRTUAL TABLE IF NOT EXISTS stock_list_fts USING fts5(code, name, tokenize='trigram')")
+            
+            # 首次创建时为已有数据建立索引
+            if not has_news_fts:
+                cursor.execute("INSERT INTO news_fts(news_fts) VALUES ('rebuild')")
+            if not has_stock_fts:
+                cursor.execute("INSERT INTO stock_list_fts (code, name) SELECT code, name FROM stock_list")
+            return True
+        except sqlite3.OperationalError as e:
+            logger.warning(f"⚠️ FTS5 trigram unavailable, falling back to LIKE search: {e}")
+            return False
+
+    def _fts_phrase(self, query: str) -> Optional[str]:
+        """把查询串转为 FTS5 短语（转义双引号）；不可用或过短时返回 None"""
+        if not self._fts or len(query) < self._FTS_MIN_QUERY_LEN:
+            return None
+        return '"' + query.replace('"', '""') + '"'
+
     # --- 新闻数据操作 ---
     
     def save_daily_news(self, news_list: List[Dict]) -> int:
         """保存热点新闻，包含发布时间与抓取时间"""
-        cursor = self.conn.cursor()
-        count = 0
         crawl_time = datetime.now().isoformat()
         
+        # 先在 Python 侧组装参数元组（逐条容错），再单事务 executemany 批量写入
+        rows = []
         for news in news_list:
             try:
                 # 兼容不同来源的 ID 生成逻辑
                 news_id = news.get('id') or f"{news.get('source')}_{news.get('rank')}_{crawl_time[:10]}"
-                cursor.execute("""
-                    INSERT OR REPLACE INTO daily_news 
-                    (id, source, rank, title, url, content, publish_time, crawl_time, sentiment_score, meta_data)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                """, (
+                rows.append((
                     news_id,
                     news.get('source'),
                     news.get('rank'),
@@ -185,35 +462,32 @@ class DatabaseManager:
                     news.get('publish_time'), # 新增支持发布时间
                     crawl_time,
                     news.get('sentiment_score'),
-                    json.dumps(news.get('meta_data', {}))
+                    _dumps(news.get('meta_data', {}))
                 ))
-                count += 1
-            except sqlite3.Error as e:
-                logger.error(f"Database error saving news item {news.get('title')}: {e}")
             except Exception as e:
                 logger.error(f"Unexpected error saving news item {news.get('title')}: {e}")
         
-        self.conn.commit()
-        return count
+        if not rows:
+            return 0
+        try:
+            with self._write_lock, self.conn:
+                self.conn.executemany(_INSERT_NEWS_SQL, rows)
+        except sqlite3.Error as e:
+            logger.error(f"Database error saving {len(rows)} news items: {e}")
+            return 0
+        return len(rows)
 
     def get_daily_news(self, source: Optional[str] = None, limit: int = 100, days: int = 1) -> List[Dict]:
         """获取最近 N 天的热点新闻"""
-        cursor = self.conn.cursor()
+        cursor = self._reader.cursor()
         # 使用 crawl_time 过滤，保证结果的新鲜度
         time_threshold = (datetime.now().timestamp() - days * 86400)
         time_threshold_str = datetime.fromtimestamp(time_threshold).isoformat()
         
-        query = "SELECT * FROM daily_news WHERE crawl_time >= ?"
-        params = [time_threshold_str]
-        
         if source:
-            query += " AND source = ?"
-            params.append(source)
-            
-        query += " ORDER BY crawl_time DESC, rank LIMIT ?"
-        params.append(limit)
-        
-        cursor.execute(query, params)
+            cursor.execute(_SELECT_NEWS_BY_SOURCE_SQL, (time_threshold_str, source, limit))
+        else:
+            cursor.execute(_SELECT_NEWS_SQL, (time_threshold_str, limit))
         return [dict(row) for row in cursor.fetchall()]
 
     def lookup_reference_by_url(self, url: str) -> Optional[Dict[str, Any]]:
@@ -226,7 +500,7 @@ class DatabaseManager:
         if not url:
             return None
 
-        cursor = self.conn.cursor()
+        cursor = self._reader.cursor()
 
         try:
             cursor.execute(
@@ -266,57 +540,77 @@ class DatabaseManager:
 
     def delete_news(self, news_id: str) -> bool:
         """删除特定新闻"""
-        cursor = self.conn.cursor()
-        cursor.execute("DELETE FROM daily_news WHERE id = ?", (news_id,))
-        self.conn.commit()
+        with self._write_lock:
+            cursor = self.conn.cursor()
+            cursor.execute("DELETE FROM daily_news WHERE id = ?", (news_id,))
+            self.conn.commit()
         return cursor.rowcount > 0
     
     def update_news_content(self, news_id: str, content: str = None, analysis: str = None) -> bool:
         """更新新闻的内容或分析结果"""
-        cursor = self.conn.cursor()
-        updates = []
-        params = []
-        
-        if content is not None:
-            updates.append("content = ?")
-            params.append(content)
-        if analysis is not None:
-            updates.append("analysis = ?")
-            params.append(analysis)
-            
-        if not updates:
+        query = _UPDATE_NEWS_SQL.get((content is not None, analysis is not None))
+        if query is None:
             return False
             
+        params = [value for value in (content, analysis) if value is not None]
         params.append(news_id)
-        query = f"UPDATE daily_news SET {', '.join(updates)} WHERE id = ?"
-        cursor.execute(query, params)
-        self.conn.commit()
+        with self._write_lock:
+            cursor = self.conn.cursor()
+            cursor.execute(query, params)
+            self.conn.commit()
         return cursor.rowcount > 0
 
+    def update_news_contents(self, updates: List[tuple]) -> int:
+        """批量更新新闻正文，updates 为 (content, news_id) 列表，单事务提交"""
+        if not updates:
+            return 0
+        with self._write_lock, self.conn:
+            cursor = self.conn.executemany("UPDATE daily_news SET content = ? WHERE id = ?", updates)
+        return cursor.rowcount
+
+    def update_news_sentiments(self, rows: List[tuple]) -> int:
+        """批量写入情绪分析结果，rows 为 (score, reason, news_id) 列表，单事务提交"""
+        if not rows:
+            return 0
+        with self._write_lock, self.conn:
+            cursor = self.conn.executemany("""
+                UPDATE daily_news 
+                SET sentiment_score = ?, meta_data = json_set(COALESCE(meta_data, '{}'), '$.sentiment_reason', ?)
+                WHERE id = ?
+            """, rows)
+        return cursor.rowcount
+
     # --- 搜索缓存辅助 ---
     
     def get_search_cache(self, query_hash: str, ttl_seconds: Optional[int] = None) -> Optional[Dict]:
         """获取搜索缓存 (优先查 search_detail)"""
-        cursor = self.conn.cursor()
+        cursor = self._reader.cursor()
         
         # 1. 尝试从 search_detail 获取展开的结构化数据
+        # 先只取首条的 crawl_time 检查 TTL（走 (query_hash, rank) 索引），过期时不再读取整行正文
         cursor.execute("""
-            SELECT * FROM search_detail 
+            SELECT crawl_time FROM search_detail 
             WHERE query_hash = ? 
             ORDER BY rank
+            LIMIT 1
         """, (query_hash,))
-        details = [dict(row) for row in cursor.fetchall()]
+        first = cursor.fetchone()
         
-        if details:
+        if first:
             # 检查 TTL (取第一条的时间)
-            first_time = datetime.fromisoformat(details[0]['crawl_time'])
+            first_time = datetime.fromisoformat(first['crawl_time'])
             if ttl_seconds and (datetime.now() - first_time).total_seconds() > ttl_seconds:
                 logger.info(f"⌛ Detailed cache expired for hash {query_hash}")
-                pass # Expired, fall through or return None? If Detail expired, Cache likely expired too.
-                # But let's check basic cache just in case metadata differs? 
-                # Actually if details exist, we prefer them. If expired, we return None.
+                # If details exist, we prefer them. If expired, we return None.
                 return None
             
+            cursor.execute("""
+                SELECT * FROM search_detail 
+                WHERE query_hash = ? 
+                ORDER BY rank
+            """, (query_hash,))
+            details = [dict(row) for row in cursor.fetchall()]
+            
             logger.info(f"✅ Hit detailed search cache for {query_hash} ({len(details)} items)")
             # Reconstruct the expected 'results' list format for SearchTools
             # SearchTools expects a list of dicts. 
@@ -328,7 +622,7 @@ class DatabaseManager:
             # To minimize SearchTools changes, we can return a dict mimicking the old structure
             # OR Change SearchTools to handle list return.
             # Let's return a special dict that SearchTools can recognize or just format it as before.
-            return {"results": json.dumps(details), "timestamp": details[0]['crawl_time']}
+            return {"results": _dumps(details), "timestamp": details[0]['crawl_time']}
 
         # 2. Fallback to old table
         cursor.execute("SELECT * FROM search_cache WHERE query_hash = ?", (query_hash,))
@@ -348,27 +642,16 @@ class DatabaseManager:
 
     def save_search_cache(self, query_hash: str, query: str, engine: str, results: Union[str, List[Dict]]):
         """保存搜索结果 (同时保存到 search_cache 和 search_detail)"""
-        cursor = self.conn.cursor()
         current_time = datetime.now().isoformat()
+        results_str = results if isinstance(results, str) else _dumps(results)
         
-        results_str = results if isinstance(results, str) else json.dumps(results)
-        
-        # 1. Save summary to search_cache
-        cursor.execute("""
-            INSERT OR REPLACE INTO search_cache (query_hash, query, engine, results, timestamp)
-            VALUES (?, ?, ?, ?, ?)
-        """, (query_hash, query, engine, results_str, current_time))
-        
-        # 2. Save details to search_detail if results is a list
+        # 先在 Python 侧组装明细参数元组（逐条容错），再与摘要行同一事务 executemany 写入
+        detail_rows = []
         if isinstance(results, list):
             for item in results:
                 try:
                     item_id = item.get('id') or f"{hash(item.get('url', ''))}"
-                    cursor.execute("""
-                        INSERT OR REPLACE INTO search_detail
-                        (id, query_hash, rank, title, url, content, publish_time, crawl_time, sentiment_score, source, meta_data)
-                        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                    """, (
+                    detail_rows.append((
                         str(item_id),
                         query_hash,
                         item.get('rank', 0),
@@ -379,34 +662,57 @@ class DatabaseManager:
                         item.get('crawl_time') or current_time,
                         item.get('sentiment_score'),
                         item.get('source'),
-                        json.dumps(item.get('meta_data', {}))
+                        _dumps(item.get('meta_data', {}))
                     ))
-                except sqlite3.Error as e:
-                    logger.error(f"Database error saving search detail {item.get('title')}: {e}")
                 except Exception as e:
                     logger.error(f"Unexpected error saving search detail {item.get('title')}: {e}")
-                    
-        self.conn.commit()
+        
+        try:
+            # 并发搜索（如 aggregate_search 多引擎同时返回）共享同一写连接，事务需串行
+            with self._write_lock, self.conn:
+                # 1. Save summary to search_cache
+                self.conn.execute(_INSERT_SEARCH_CACHE_SQL, (query_hash, query, engine, results_str, current_time))
+                # 2. Save details to search_detail if results is a list
+                if detail_rows:
+                    self.conn.executemany(_INSERT_SEARCH_DETAIL_SQL, detail_rows)
+        except sqlite3.Error as e:
+            logger.error(f"Database error saving search cache for {query}: {e}")
 
-    def find_similar_queries(self, query: str, limit: int = 5) -> List[Dict]:
-        """模糊搜索相似的已缓存查询"""
-        cursor = self.conn.cursor()
+    def find_similar_queries(self, query: str, limit: int = 5, since: Optional[str] = None) -> List[Dict]:
+        """
+        模糊搜索相似的已缓存查询
+        
+        since 为 ISO 时间串时只返回该时刻之后写入的缓存；timestamp 同为 isoformat 写入，按字符串比较即按时间比较
+        """
+        cursor = self._reader.cursor()
         
         # Simple fuzzy match: query in cached OR cached in query
         q_wild = f"%{query}%"
         cursor.execute("""
             SELECT query, query_hash, timestamp, results 
             FROM search_cache 
-            WHERE query LIKE ? OR ? LIKE ('%' || query || '%')
+            WHERE (query LIKE ? OR ? LIKE ('%' || query || '%'))
+              AND (? IS NULL OR timestamp > ?)
             ORDER BY timestamp DESC
             LIMIT ?
-        """, (q_wild, query, limit))
+        """, (q_wild, query, since, since, limit))
         
         return [dict(row) for row in cursor.fetchall()]
 
     def search_local_news(self, query: str, limit: int = 5) -> List[Dict]:
         """从本地 daily_news 搜索相关新闻"""
-        cursor = self.conn.cursor()
+        cursor = self._reader.cursor()
+        phrase = self._fts_phrase(query)
+        if phrase:
+            cursor.execute("""
+                SELECT n.* FROM daily_news n
+                JOIN news_fts f ON n.rowid = f.rowid
+                WHERE news_fts MATCH ?
+                ORDER BY n.crawl_time DESC
+                LIMIT ?
+            """, (phrase, limit))
+            return [dict(row) for row in cursor.fetchall()]
+        
         q_wild = f"%{query}%"
         # Search title and content
         cursor.execute("""
@@ -421,26 +727,38 @@ class DatabaseManager:
 
     def save_stock_list(self, df: pd.DataFrame):
         """保存股票列表到 stock_list 表"""
-        cursor = self.conn.cursor()
         try:
-            # 清空旧表
-            cursor.execute("DELETE FROM stock_list")
-            
-            # 批量插入
             data = df[['code', 'name']].to_dict('records')
-            cursor.executemany(
-                "INSERT INTO stock_list (code, name) VALUES (:code, :name)",
-                data
-            )
-            self.conn.commit()
+            # 清空旧表后批量插入，单事务内完成，出错时整体回滚
+            with self._write_lock, self.conn:
+                cursor = self.conn.cursor()
+                cursor.execute("DELETE FROM stock_list")
+                cursor.executemany(
+                    "INSERT INTO stock_list (code, name) VALUES (:code, :name)",
+                    data
+                )
+                if self._fts:
+                    cursor.execute("DELETE FROM stock_list_fts")
+                    cursor.execute("INSERT INTO stock_list_fts (code, name) SELECT code, name FROM stock_list")
         except sqlite3.Error as e:
             logger.error(f"Database error saving stock list: {e}")
         except Exception as e:
             logger.error(f"Unexpected error saving stock list: {e}")
 
+    def count_stock_list(self) -> int:
+        """返回已缓存的股票数量"""
+        cursor = self._reader.cursor()
+        cursor.execute("SELECT COUNT(*) FROM stock_list")
+        return cursor.fetchone()[0]
+
     def search_stock(self, query: str, limit: int = 5) -> List[Dict]:
         """模糊搜索股票代码或名称"""
-        cursor = self.conn.cursor()
+        cursor = self._reader.cursor()
+        phrase = self._fts_phrase(query)
+        if phrase:
+            cursor.execute("SELECT code, name FROM stock_list_fts WHERE stock_list_fts MATCH ? LIMIT ?", (phrase, limit))
+            return [dict(row) for row in cursor.fetchall()]
+        
         wild = f"%{query}%"
         cursor.execute("""
             SELECT code, name FROM stock_list 
@@ -464,7 +782,7 @@ class DatabaseManager:
         if not clean:
             return None
 
-        cursor = self.conn.cursor()
+        cursor = self._reader.cursor()
         cursor.execute("SELECT code, name FROM stock_list WHERE code = ? LIMIT 1", (clean,))
         row = cursor.fetchone()
         return dict(row) if row else None
@@ -474,8 +792,6 @@ class DatabaseManager:
         if df.empty:
             return
             
-        cursor = self.conn.cursor()
-        
         # 确保 DataFrame 有必要的列
         required_cols = ['date', 'open', 'close', 'high', 'low', 'volume', 'change_pct']
         for col in required_cols:
@@ -484,22 +800,12 @@ class DatabaseManager:
                 return
 
         try:
-            for _, row in df.iterrows():
-                cursor.execute("""
-                    INSERT OR REPLACE INTO stock_prices 
-                    (ticker, date, open, close, high, low, volume, change_pct)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-                """, (
-                    ticker,
-                    row['date'],
-                    row['open'],
-                    row['close'],
-                    row['high'],
-                    row['low'],
-                    row['volume'],
-                    row['change_pct']
-                ))
-            self.conn.commit()
+            # 按列取出 Python 原生标量（tolist 避免 numpy 标量无法绑定），zip 成行后单事务批量写入
+            # 日期统一转为 0 点 UTC 秒级时间戳（按时间差整除，与 datetime64 精度无关）
+            dates = ((pd.to_datetime(df['date']) - pd.Timestamp(0)) // pd.Timedelta(seconds=1)).tolist()
+            rows = list(zip([ticker] * len(df), dates, *(df[col].tolist() for col in required_cols[1:])))
+            with self._write_lock, self.conn:
+                self.conn.executemany(_INSERT_STOCK_PRICES_SQL, rows)
         except sqlite3.Error as e:
             logger.error(f"Database error saving stock prices for {ticker}: {e}")
         except Exception as e:
@@ -507,31 +813,41 @@ class DatabaseManager:
 
     def get_stock_prices(self, ticker: str, start_date: str, end_date: str) -> pd.DataFrame:
         """获取指定日期范围的股价数据"""
-        cursor = self.conn.cursor()
+        # 入口处把日期串转为整数时间戳，WHERE 直接走 (ticker, date) 主键的整数范围扫描；
+        # 输出时再格式化回 'YYYY-MM-DD'，调用方无感知
+        try:
+            start_epoch, end_epoch = _date_to_epoch(start_date), _date_to_epoch(end_date)
+        except (TypeError, ValueError) as e:
+            # 日期无法解析时视为本地无数据，由调用方走网络同步
+            logger.warning(f"Invalid date range for {ticker}: {e}")
+            return pd.DataFrame()
         
-        cursor.execute("""
-            SELECT * FROM stock_prices 
-            WHERE ticker = ? AND date >= ? AND date <= ?
-            ORDER BY date
-        """, (ticker, start_date, end_date))
+        cursor = self._reader.cursor()
+        # 直接取元组，免去 sqlite3.Row -> dict 的逐行转换
+        cursor.row_factory = None
+        cursor.execute(_SELECT_STOCK_PRICES_SQL, (ticker, start_epoch, end_epoch))
         
         rows = cursor.fetchall()
         if not rows:
             return pd.DataFrame()
             
         columns = ['ticker', 'date', 'open', 'close', 'high', 'low', 'volume', 'change_pct']
-        return pd.DataFrame([dict(row) for row in rows], columns=columns)
+        # 元组按列直接构建，并一次性指定数值列类型（NULL -> NaN）
+        return pd.DataFrame.from_records(rows, columns=columns).astype(
+            {col: 'float64' for col in columns[2:]}
+        )
 
     def execute_query(self, query: str, params: tuple = ()) -> List[Any]:
         """执行自定义 SQL 查询"""
         try:
-            cursor = self.conn.cursor()
-            cursor.execute(query, params)
-            if query.strip().upper().startswith("SELECT"):
-                return cursor.fetchall()
-            else:
-                self.conn.commit()
-                return []
+            with self._write_lock:
+                cursor = self.conn.cursor()
+                cursor.execute(query, params)
+                if query.strip().upper().startswith("SELECT"):
+                    return cursor.fetchall()
+                else:
+                    self.conn.commit()
+                    return []
         except sqlite3.Error as e:
             logger.error(f"SQL execution failed (Database error): {e}")
             return []
@@ -539,57 +855,64 @@ class DatabaseManager:
             logger.error(f"SQL execution failed (Unexpected error): {e}")
             return []
 
+    def iter_query(self, query: str, params: tuple = ()) -> Iterator[Any]:
+        """流式执行只读查询，逐行产出，不经 fetchall 一次性物化全部结果"""
+        try:
+            yield from self._reader.cursor().execute(query, params)
+        except sqlite3.Error as e:
+            logger.error(f"SQL query failed (Database error): {e}")
+
     # --- 投资信号操作 (ISQ Framework) ---
 
     def save_signal(self, signal: Dict[str, Any]):
         """保存投资信号"""
-        cursor = self.conn.cursor()
         created_at = datetime.now().isoformat()
-        
-        cursor.execute("""
-            INSERT OR REPLACE INTO signals 
-            (signal_id, title, summary, transmission_chain, sentiment_score, 
-             confidence, intensity, expected_horizon, price_in_status, 
-             impact_tickers, industry_tags, sources, user_id, created_at)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        """, (
+        params = (
             signal.get('signal_id'),
             signal.get('title'),
             signal.get('summary'),
-            json.dumps(signal.get('transmission_chain', [])),
+            _dumps(signal.get('transmission_chain', [])),
             signal.get('sentiment_score', 0.0),
             signal.get('confidence', 0.0),
             signal.get('intensity', 1),
             signal.get('expected_horizon', 'T+0'),
             signal.get('price_in_status', '未知'),
-            json.dumps(signal.get('impact_tickers', [])),
-            json.dumps(signal.get('industry_tags', [])),
-            json.dumps(signal.get('sources', [])),
+            _dumps(signal.get('impact_tickers', [])),
+            _dumps(signal.get('industry_tags', [])),
+            _dumps(signal.get('sources', [])),
             signal.get('user_id'),
             created_at
-        ))
-        self.conn.commit()
+        )
+        with self._write_lock, self.conn:
+            self.conn.execute(_INSERT_SIGNAL_SQL, params)
 
     def get_recent_signals(self, limit: int = 20, user_id: Optional[str] = None) -> List[Dict]:
         """获取最近的投资信号"""
-        cursor = self.conn.cursor()
-        if user_id:
-            cursor.execute("SELECT * FROM signals WHERE user_id = ? ORDER BY created_at DESC LIMIT ?", (user_id, limit))
-        else:
-            cursor.execute("SELECT * FROM signals ORDER BY created_at DESC LIMIT ?", (limit,))
-        rows = cursor.fetchall()
+        # 由 SQLite JSON1 在 C 层把整批结果拼成一个 JSON 数组（JSON 字段经 json() 内嵌为对象），
+        # Python 侧只需一次 _loads，不再逐行逐字段解析；非法 JSON 按原样保留为字符串
+        where = "WHERE user_id = ?" if user_id else ""
+        params = (user_id, limit) if user_id else (limit,)
+        return self._query_signals(where, params)
+
+    def get_signals_for_ticker(self, ticker: str, limit: int = 20, primary_only: bool = False) -> List[Dict]:
+        """
+        获取影响指定代码的最近投资信号
         
-        signals = []
-        for row in rows:
-            d = dict(row)
-            # 解析 JSON 字段
-            for field in ['transmission_chain', 'impact_tickers', 'industry_tags', 'sources']:
-                if d.get(field):
-                    try:
-                        d[field] = json.loads(d[field])
-                    except:
-                        pass
-            signals.append(d)
+        过滤在 SQL 内通过 json_each 完成，不匹配的信号不再传回 Python 解析；
+        primary_only=True 时只匹配首个受影响代码，走 first_ticker 生成列索引。
+        """
+        where = "WHERE first_ticker = ?" if primary_only else f"WHERE {_SIGNAL_TICKER_FILTER}"
+        return self._query_signals(where, (str(ticker), limit))
+
+    def _query_signals(self, where: str, params: tuple) -> List[Dict]:
+        cursor = self._reader.cursor()
+        cursor.execute(f"""
+            SELECT json_group_array(json_object({_SIGNAL_JSON_OBJECT_ARGS}))
+            FROM (SELECT * FROM signals {where} ORDER BY created_at DESC LIMIT ?)
+        """, params)
+        signals = _loads(cursor.fetchone()[0])
+        # 聚合函数不保证保留子查询的行序，取回后按 created_at 重新降序排列（NULL 排最后，与 SQL 一致）
+        signals.sort(key=lambda s: s.get('created_at') or '', reverse=True)
         return signals
 
     # --- 用户管理 ---
@@ -611,50 +934,57 @@ class DatabaseManager:
 
     def create_invitation_code(self, code: str) -> bool:
         try:
-            cursor = self.conn.cursor()
-            cursor.execute("INSERT INTO invitation_codes (code, created_at) VALUES (?, ?)", 
-                          (code, datetime.now().isoformat()))
-            self.conn.commit()
+            with self._write_lock, self.conn:
+                self.conn.execute("INSERT INTO invitation_codes (code, created_at) VALUES (?, ?)", 
+                                  (code, datetime.now().isoformat()))
             return True
         except sqlite3.IntegrityError:
             return False
 
     def verify_invitation_code(self, code: str) -> bool:
-        cursor = self.conn.cursor()
+        cursor = self._reader.cursor()
         cursor.execute("SELECT 1 FROM invitation_codes WHERE code = ? AND is_used = 0", (code,))
         return cursor.fetchone() is not None
 
     def create_user(self, username: str, password_hash: str, invitation_code: str) -> bool:
-        cursor = self.conn.cursor()
-        
-        # Verify invitation code
-        cursor.execute("SELECT code FROM invitation_codes WHERE code = ? AND is_used = 0", (invitation_code,))
-        if not cursor.fetchone():
-            return False
-            
-        try:
-            # Create user
-            cursor.execute("INSERT INTO users (username, password_hash, created_at) VALUES (?, ?, ?)",
-                          (username, password_hash, datetime.now().isoformat()))
-            user_id = cursor.lastrowid
-            
-            # Mark code as used
-            cursor.execute("UPDATE invitation_codes SET is_used = 1, used_by = ? WHERE code = ?",
-                          (user_id, invitation_code))
+        # 校验邀请码与建用户在同一把写锁内完成，避免并发注册重复使用同一邀请码
+        with self._write_lock:
+            cursor = self.conn.cursor()
             
-            self.conn.commit()
-            return True
-        except sqlite3.IntegrityError:
-            self.conn.rollback()
-            return False
+            # Verify invitation code
+            cursor.execute("SELECT code FROM invitation_codes WHERE code = ? AND is_used = 0", (invitation_code,))
+            if not cursor.fetchone():
+                return False
+                
+            try:
+                # Create user
+                cursor.execute("INSERT INTO users (username, password_hash, created_at) VALUES (?, ?, ?)",
+                              (username, password_hash, datetime.now().isoformat()))
+                user_id = cursor.lastrowid
+                
+                # Mark code as used
+                cursor.execute("UPDATE invitation_codes SET is_used = 1, used_by = ? WHERE code = ?",
+                              (user_id, invitation_code))
+                
+                self.conn.commit()
+                return True
+            except sqlite3.IntegrityError:
+                self.conn.rollback()
+                return False
 
     def get_user_by_username(self, username: str) -> Optional[Dict]:
-        cursor = self.conn.cursor()
+        cursor = self._reader.cursor()
         cursor.execute("SELECT * FROM users WHERE username = ?", (username,))
         row = cursor.fetchone()
         return dict(row) if row else None
 
     def close(self):
+        with self._readers_lock:
+            readers = list(self._readers)
+            self._readers.clear()
+        for reader in readers:
+            reader.close()
+        self._local = threading.local()
         if self.conn:
             self.conn.close()
             logger.info("Database connection closed.")
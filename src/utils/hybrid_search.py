@@ -1,11 +1,94 @@
+import hashlib
 import numpy as np
 import os
+from collections import Counter
 from typing import List, Dict, Any, Optional, Union
 from rank_bm25 import BM25Okapi
 from loguru import logger
+from utils.checkpointing import _atomic_write
 from sentence_transformers import SentenceTransformer
 from sklearn.metrics.pairwise import cosine_similarity
 
+try:
+    from scipy import sparse
+except ImportError:
+    sparse = None
+
+
+class SparseBM25:
+    """
+    与 rank_bm25.BM25Okapi 打分一致的稀疏矩阵实现
+    
+    拟合时把每个 (文档, 词) 的 BM25 权重预先算进 CSR 矩阵，
+    get_scores 只需一次稀疏矩阵-向量乘法，无需逐文档逐词的 Python 循环。
+    """
+    
+    def __init__(self, corpus: List[List[str]], k1: float = 1.5, b: float = 0.75, epsilon: float = 0.25):
+        self.k1 = k1
+        self.b = b
+        self.epsilon = epsilon
+        self.corpus_size = len(corpus)
+        self.vocab: Dict[str, int] = {}
+        
+        indptr = [0]
+        indices: List[int] = []
+        tf: List[int] = []
+        for tokens in corpus:
+            for token, count in Counter(tokens).items():
+                indices.append(self.vocab.setdefault(token, len(self.vocab)))
+                tf.append(count)
+            indptr.append(len(indices))
+        
+        indptr_arr = np.asarray(indptr, dtype=np.int64)
+        indices_arr = np.asarray(indices, dtype=np.int64)
+        tf_arr = np.asarray(tf, dtype=np.float64)
+        doc_len = np.array([len(tokens) for tokens in corpus], dtype=np.float64)
+        self.avgdl = doc_len.sum() / self.corpus_size
+        
+        # idf 与 BM25Okapi 相同：负 idf 以 epsilon * 平均 idf 兜底
+        doc_freq = np.bincount(indices_arr, minlength=len(self.vocab))
+        self.idf = np.log((self.corpus_size - doc_freq + 0.5) / (doc_freq + 0.5))
+        self.idf[self.idf < 0] = self.epsilon * self.idf.mean()
+        
+        norm = np.repeat(self.k1 * (1 - self.b + self.b * doc_len / self.avgdl), np.diff(indptr_arr))
+        weights = self.idf[indices_arr] * tf_arr * (self.k1 + 1) / (tf_arr + norm)
+        self.matrix = sparse.csr_matrix(
+            (weights, indices_arr, indptr_arr), shape=(self.corpus_size, len(self.vocab))
+        )
+
+    def get_scores(self, query: List[str]) -> np.ndarray:
+        """计算查询对全部文档的 BM25 分数（重复的查询词重复计分，与 BM25Okapi 一致）"""
+        query_vec = np.zeros(len(self.vocab), dtype=np.float64)
+        for token in query:
+            idx = self.vocab.get(token)
+            if idx is not None:
+                query_vec[idx] += 1.0
+        return self.matrix @ query_vec
+
+    def save(self, path: str) -> None:
+        """以 npz 持久化已拟合的索引（原子写入）"""
+        arrays = dict(
+            data=self.matrix.data, indices=self.matrix.indices, indptr=self.matrix.indptr,
+            shape=np.asarray(self.matrix.shape), idf=self.idf,
+            vocab=np.asarray(list(self.vocab), dtype=str),
+            params=np.asarray([self.k1, self.b, self.epsilon, self.avgdl]),
+        )
+        _atomic_write(path, lambda f: np.savez(f, **arrays))
+
+    @classmethod
+    def load(cls, path: str) -> "SparseBM25":
+        """从 save 写出的 npz 恢复索引，跳过分词与拟合"""
+        with np.load(path) as npz:
+            self = cls.__new__(cls)
+            self.k1, self.b, self.epsilon, self.avgdl = (float(x) for x in npz["params"])
+            self.idf = npz["idf"]
+            self.vocab = {token: i for i, token in enumerate(npz["vocab"].tolist())}
+            shape = tuple(int(x) for x in npz["shape"])
+            self.matrix = sparse.csr_matrix((npz["data"], npz["indices"], npz["indptr"]), shape=shape)
+            self.corpus_size = shape[0]
+        return self
+
+
 class HybridSearcher:
     """
     统一混合检索引擎 (Hybrid RAG)
@@ -24,6 +107,11 @@ class HybridSearcher:
         self.data = data
         self.text_fields = text_fields
         self._corpus = []
+        # 分词缓存：文本内容哈希 -> tokens，重建语料时未变化的文档不再重复分词
+        self._token_cache: Dict[bytes, List[str]] = {}
+        self._corpus_keys: List[bytes] = []
+        # 语料已变但索引尚未重建；由 search 按需拟合，连续多次更新只拟合一次
+        self._dirty = False
         self._bm25 = None
         self._vector_model = None
         self._embeddings = None
@@ -39,25 +127,41 @@ class HybridSearcher:
             # 延迟加载向量模型，仅在需要时或初始化时显式调用
             # self._fit_vector() 
 
+    def _item_text(self, item: Dict[str, Any]) -> str:
+        return " ".join([str(item.get(field, "")) for field in self.text_fields])
+
     def _prepare_corpus(self):
         """准备语料库用于分词"""
         import jieba  # 使用 jieba 进行中文分词
         
         self._corpus = []
         self._full_texts = []
+        # 只保留当前语料的缓存项，避免反复 update/load 时缓存无限增长
+        previous_cache, self._token_cache = self._token_cache, {}
+        self._corpus_keys = []
         for item in self.data:
-            text = " ".join([str(item.get(field, "")) for field in self.text_fields])
+            text = self._item_text(item)
             self._full_texts.append(text)
-            # 中文分词优化
-            tokens = list(jieba.cut(text))
+            key = hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest()
+            tokens = previous_cache.get(key)
+            if tokens is None:
+                # 中文分词优化
+                tokens = jieba.lcut(text)
+            self._token_cache[key] = tokens
+            self._corpus_keys.append(key)
             self._corpus.append(tokens)
 
     def _fit_bm25(self):
         """训练 BM25 模型"""
         if self._corpus:
-            self._bm25 = BM25Okapi(self._corpus)
+            # 优先使用稀疏矩阵实现；未安装 scipy 时回退 rank_bm25
+            self._bm25 = SparseBM25(self._corpus) if sparse is not None else BM25Okapi(self._corpus)
             self._fitted = True
             logger.info(f"✅ BM25 index fitted with {len(self.data)} documents")
+        else:
+            self._bm25 = None
+            self._fitted = False
+        self._dirty = False
 
     def _fit_vector(self):
         """训练向量模型并生成 Embeddings"""
@@ -65,8 +169,9 @@ class HybridSearcher:
             return
             
         try:
-            logger.info(f"📡 Loading embedding model: {self.model_name}...")
-            self._vector_model = SentenceTransformer(self.model_name)
+            if self._vector_model is None:
+                logger.info(f"📡 Loading embedding model: {self.model_name}...")
+                self._vector_model = SentenceTransformer(self.model_name)
             logger.info(f"🧠 Encoding {len(self._full_texts)} documents...")
             self._embeddings = self._vector_model.encode(self._full_texts, show_progress_bar=False)
             self._vector_fitted = True
@@ -75,24 +180,43 @@ class HybridSearcher:
             logger.error(f"❌ Failed to fit vector index: {e}")
             self._vector_fitted = False
 
-    def _compute_rrf(self, rank_lists: List[List[int]], k: int = 60) -> List[tuple]:
+    @staticmethod
+    def _top_k(scores: np.ndarray, k: int) -> np.ndarray:
+        """返回分数最高的 k 个下标（降序）；argpartition 选出候选后只对这 k 个排序"""
+        if k <= 0:
+            return np.empty(0, dtype=np.intp)
+        if k < len(scores):
+            # 纳入与第 k 名同分的全部下标，使边界上的并列也按下标决出
+            kth = scores[np.argpartition(-scores, k - 1)[k - 1]]
+            top = np.flatnonzero(scores >= kth)
+        else:
+            top = np.arange(len(scores))
+        # 同分时按下标升序，保证结果稳定
+        return top[np.lexsort((top, -scores[top]))][:k]
+
+    def _compute_rrf(self, rank_lists: List[List[int]], k: int = 60, top_n: Optional[int] = None) -> List[tuple]:
         """
         计算 Reciprocal Rank Fusion (RRF)
         
         Args:
             rank_lists: 多个排序后的索引列表
             k: RRF 常数，默认 60
+            top_n: 只返回融合后前 N 条，默认返回全部
         """
-        scores = {}
-        for rank_list in rank_lists:
-            for rank, idx in enumerate(rank_list):
-                if idx not in scores:
-                    scores[idx] = 0
-                scores[idx] += 1.0 / (k + rank + 1)
+        rank_arrays = [np.asarray(rank_list, dtype=np.intp) for rank_list in rank_lists]
+        size = max((int(r.max()) + 1 for r in rank_arrays if r.size), default=0)
+        scores = np.zeros(size, dtype=np.float64)
+        for ranks in rank_arrays:
+            np.add.at(scores, ranks, 1.0 / (k + np.arange(len(ranks)) + 1))
         
-        # 按分数排序
-        sorted_indices = sorted(scores.items(), key=lambda x: x[1], reverse=True)
-        return sorted_indices
+        # 候选为出现过的下标，按首次出现顺序排列（同分时与原 dict 插入顺序一致）
+        concat = np.concatenate(rank_arrays) if rank_arrays else np.empty(0, dtype=np.intp)
+        uniq, first_pos = np.unique(concat, return_index=True)
+        candidates = uniq[np.argsort(first_pos)]
+        cand_scores = scores[candidates]
+        
+        order = self._top_k(cand_scores, len(candidates) if top_n is None else top_n)
+        return [(int(candidates[i]), float(cand_scores[i])) for i in order]
 
     def search(self, query: str, top_n: int = 5, use_vector: bool = False) -> List[Dict[str, Any]]:
         """
@@ -103,6 +227,8 @@ class HybridSearcher:
             top_n: 返回结果数量
             use_vector: 是否启用向量搜索
         """
+        if self._dirty:
+            self._fit_bm25()
         if not self._fitted or not query:
             return []
         
@@ -110,10 +236,9 @@ class HybridSearcher:
         query_tokens = list(jieba.cut(query))
         
         # 1. BM25 搜索结果
-        bm25_scores = self._bm25.get_scores(query_tokens)
-        bm25_rank = np.argsort(bm25_scores)[::-1].tolist()
+        bm25_scores = np.asarray(self._bm25.get_scores(query_tokens))
         
-        rank_lists = [bm25_rank]
+        rank_lists = []
         
         # 2. 向量搜索逻辑
         if use_vector:
@@ -123,18 +248,19 @@ class HybridSearcher:
             if self._vector_fitted:
                 query_embedding = self._vector_model.encode([query], show_progress_bar=False)
                 similarities = cosine_similarity(query_embedding, self._embeddings)[0]
-                vector_rank = np.argsort(similarities)[::-1].tolist()
+                vector_rank = np.argsort(similarities)[::-1]
                 rank_lists.append(vector_rank)
             else:
                 logger.warning("Vector search requested but model not fitted, falling back to BM25")
         
-        # 3. 融合排序 (RRF)
-        if len(rank_lists) > 1:
-            rrf_results = self._compute_rrf(rank_lists)
+        # 3. 融合排序 (RRF)：融合需要完整排序；仅 BM25 时只需选出 Top-N
+        if rank_lists:
+            bm25_rank = np.argsort(bm25_scores)[::-1]
+            rrf_results = self._compute_rrf([bm25_rank] + rank_lists, top_n=top_n)
             # RRF 返回 (idx, score) 列表
             final_rank = [idx for idx, score in rrf_results]
         else:
-            final_rank = bm25_rank
+            final_rank = self._top_k(bm25_scores, top_n).tolist()
         
         # 返回前 top_n 条结果
         results = [self.data[idx].copy() for idx in final_rank[:top_n]]
@@ -159,18 +285,27 @@ class InMemoryRAG(HybridSearcher):
         return super().search(query, top_n=top_n, use_vector=use_vector)
 
     def update_data(self, new_data: List[Dict[str, Any]]):
-        """动态更新数据并重新训练索引"""
+        """
+        动态更新数据；索引延迟到下一次 search 时重建
+        
+        只对新增/变化的文档分词（分词缓存），语料未变化时不触发重建；
+        向量索引同样在下次需要时复用已加载的模型重新编码。
+        """
+        previous_keys = self._corpus_keys
         self.data = new_data
         self._prepare_corpus()
-        self._fit_bm25()
-        # 如果之前已经加载过向量模型，则更新向量索引
-        if self._vector_model:
-            self._fit_vector()
+        if self._corpus_keys != previous_keys:
+            self._dirty = True
+            self._vector_fitted = False
+            self._embeddings = None
         logger.info(f"🔄 InMemoryRAG updated with {len(new_data)} items")
 
 class LocalNewsSearch(HybridSearcher):
     """持久态 RAG：检索数据库中的历史新闻"""
     
+    # BM25 索引磁盘缓存：历史新闻未变化时，重启后直接加载，免去分词与拟合
+    _cache_dir = os.getenv("BM25_CACHE_DIR", "data/bm25_cache")
+    
     def __init__(self, db_manager):
         """
         Args:
@@ -183,32 +318,59 @@ class LocalNewsSearch(HybridSearcher):
     def load_history(self, days: int = 30, limit: int = 1000):
         """从数据库加载最近 N 天的新闻构建索引"""
         try:
-            # 假设 db_manager 有 execute_query
-            query = f"SELECT title, content, publish_time, source FROM daily_news ORDER BY publish_time DESC LIMIT ?"
-            results = self.db.execute_query(query, (limit,))
-            
-            data = []
-            for row in results:
-                # 转换 Row 为 Dict
-                if hasattr(row, 'keys'):
-                    item = dict(row)
-                else:
-                    item = {
-                        "title": row[0], 
-                        "content": row[1], 
-                        "publish_time": row[2],
-                        "source": row[3]
-                    }
-                data.append(item)
+            query = "SELECT title, content, publish_time, source FROM daily_news ORDER BY publish_time DESC LIMIT ?"
+            # 游标逐行转 dict，不再先 fetchall 出整批 Row 再复制一遍
+            data = [dict(row) for row in self.db.iter_query(query, (limit,))]
             
             self.data = data
-            self._prepare_corpus()
-            self._fit_bm25()
+            if not self._load_cached_bm25():
+                self._prepare_corpus()
+                self._fit_bm25()
+                self._save_cached_bm25()
             # 默认不立即训练向量，等到第一次搜索时按需训练
             logger.info(f"📚 LocalNewsSearch loaded {len(data)} items from history")
         except Exception as e:
             logger.error(f"Failed to load history for search: {e}")
 
+    def _cache_path(self) -> str:
+        """按全部文档文本的哈希定位缓存文件，任何新闻的增删改都会换用新文件"""
+        digest = hashlib.blake2b(digest_size=16)
+        for item in self.data:
+            digest.update(hashlib.blake2b(self._item_text(item).encode("utf-8"), digest_size=8).digest())
+        return os.path.join(self._cache_dir, f"{digest.hexdigest()}.npz")
+
+    def _load_cached_bm25(self) -> bool:
+        if sparse is None or not self.data:
+            return False
+        path = self._cache_path()
+        if not os.path.exists(path):
+            return False
+        try:
+            self._bm25 = SparseBM25.load(path)
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"Failed to load BM25 cache {path}: {e}")
+            return False
+        # 向量索引仍需全文；分词结果不再需要
+        self._full_texts = [self._item_text(item) for item in self.data]
+        self._corpus = []
+        self._fitted = True
+        self._dirty = False
+        logger.info(f"⚡ Loaded cached BM25 index for {len(self.data)} documents")
+        return True
+
+    def _save_cached_bm25(self):
+        if not isinstance(self._bm25, SparseBM25):
+            return
+        path = self._cache_path()
+        try:
+            self._bm25.save(path)
+            # 只保留最新的索引文件
+            for name in os.listdir(self._cache_dir):
+                if name.endswith(".npz") and os.path.join(self._cache_dir, name) != path:
+                    os.unlink(os.path.join(self._cache_dir, name))
+        except OSError as e:
+            logger.warning(f"Failed to write BM25 cache {path}: {e}")
+
     def search(self, query: str, top_n: int = 5, use_vector: bool = True) -> List[Dict[str, Any]]:
         """执行本地历史搜索，默认开启向量搜索"""
         if not self.data:
@@ -1,60 +1,75 @@
 import ast
 import json
 import re
+from functools import lru_cache
 from typing import Optional, Any
 from loguru import logger
 
+# orjson 可选：存在时用其 C/Rust 实现做整段编解码，否则回退标准库
+try:
+    import orjson
+
+    def _dumps(obj: Any) -> str:
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS).decode()
+
+    _loads = orjson.loads
+except ImportError:
+    _dumps = json.dumps
+    _loads = json.loads
+
+# 字符串字面量（含未闭合的）优先匹配并原样保留，其余 // 行注释与 /* */ 块注释（含未闭合的）删除
+_COMMENT_RE = re.compile(r'("(?:\\.?|[^"\\])*(?:"|\Z))|//[^\n]*|/\*.*?(?:\*/|\Z)', re.DOTALL)
+
+# 键名引号修复（缺开头引号 / 缺结尾引号 / 完全缺失引号）合并为一次扫描；限定在 { 或 , 之后，避免误伤 http://
+_KEY_FIX_RE = re.compile(r'([\{,]\s*)"?([a-zA-Z_]\w*)"?\s*:')
+# 对象/列表末位多余逗号
+_TRAIL_COMMA_RE = re.compile(r',\s*([\]}])')
+_MD_BLOCK_RE = re.compile(r'```(?:json)?\s*\n?(.*?)\n?```', re.DOTALL)
+# 括号配对扫描：字符串字面量整体跳过，只在括号处回到 Python
+_BRACKET_TOKEN_RE = re.compile(r'"(?:\\.|[^"\\])*"|[\[\]{}]')
+
+def _matching_bracket_end(text: str, start: int) -> Optional[int]:
+    """返回 text[start] 处括号对应的闭合位置之后的下标，未闭合时返回 None"""
+    depth = 0
+    for m in _BRACKET_TOKEN_RE.finditer(text, start):
+        token = m.group(0)
+        if token in '[{':
+            depth += 1
+        elif token in ']}':
+            depth -= 1
+            if depth == 0:
+                return m.end()
+    return None
+
 def _strip_comments(text: str) -> str:
     """
     Safely remove C-style comments (// and /* */) from JSON-like text,
     preserving strings (including URLs like http://).
     """
-    result = []
-    i = 0
-    n = len(text)
-    in_string = False
-    escape = False
-    
-    while i < n:
-        char = text[i]
-        
-        if in_string:
-            if char == '\\':
-                escape = not escape
-            elif char == '"' and not escape:
-                in_string = False
-            else:
-                escape = False
-            result.append(char)
-            i += 1
-            continue
-            
-        # Not in string
-        if char == '"':
-            in_string = True
-            result.append(char)
-            i += 1
-            continue
-            
-        # Check for // comment
-        if i + 1 < n and text[i:i+2] == '//':
-            i += 2
-            while i < n and text[i] != '\n':
-                i += 1
-            continue
-            
-        # Check for /* comment
-        if i + 1 < n and text[i:i+2] == '/*':
-            i += 2
-            while i + 1 < n and text[i:i+2] != '*/':
-                i += 1
-            i += 2
-            continue
-            
-        result.append(char)
-        i += 1
-        
-    return ''.join(result)
+    return _COMMENT_RE.sub(lambda m: m.group(1) or '', text)
+
+def parse_model_json(text: Any, model_cls: Any) -> Optional[dict]:
+    """
+    用 Pydantic 模型的 model_validate_json 单遍解析并校验 LLM 输出，返回 dict。
+    content 已是模型实例时直接 dump；文本不是纯净 JSON 或校验失败时返回 None，
+    调用方应回退到 extract_json。
+    """
+    if isinstance(text, model_cls):
+        return text.model_dump()
+    if not isinstance(text, (str, bytes)):
+        return None
+    model = _validate_model_json(model_cls, text)
+    # 每次返回新的 dict，调用方修改结果不会污染缓存
+    return model.model_dump() if model is not None else None
+
+@lru_cache(maxsize=256)
+def _validate_model_json(model_cls: Any, text: Any) -> Optional[Any]:
+    """按 (模型类, 原始文本) 缓存解析结果，LLM 重试返回相同文本时免去重复解析与校验"""
+    try:
+        return model_cls.model_validate_json(text, strict=False)
+    except ValueError:
+        # pydantic_core.ValidationError 是 ValueError 的子类
+        return None
 
 def extract_json(text: str) -> Optional[Any]:
     """
@@ -72,8 +87,17 @@ def extract_json(text: str) -> Optional[Any]:
     # 1. 清理明显的 Markdown 包装
     text = text.strip()
     
+    # 快速路径：纯净 JSON 直接解析，跳过全部修复步骤
+    if text[:1] in ('{', '['):
+        try:
+            obj = _loads(text)
+            logger.debug("extract_json: fast path (clean JSON)")
+            return obj
+        except json.JSONDecodeError:
+            pass
+    
     # 先尝试精确匹配 ```json ... ``` 或 ```...```
-    md_match = re.search(r'```(?:json)?\s*\n?(.*?)\n?```', text, re.DOTALL)
+    md_match = _MD_BLOCK_RE.search(text)
     if md_match:
         text = md_match.group(1).strip()
     elif text.startswith("```"):
@@ -90,35 +114,41 @@ def extract_json(text: str) -> Optional[Any]:
         
     start_idx = start_brace if (start_bracket == -1 or (start_brace != -1 and start_brace < start_bracket)) else start_bracket
     
+    # 2.2 快速路径：首个完整括号段本身即合法 JSON（代码块内或前后夹杂说明文字时常见）
+    end_idx = _matching_bracket_end(text, start_idx)
+    if end_idx is not None:
+        try:
+            obj = _loads(text[start_idx:end_idx])
+            logger.debug("extract_json: fast path (bracketed JSON)")
+            return obj
+        except json.JSONDecodeError:
+            pass
+    logger.debug("extract_json: entering repair path")
+    
     # 2.5 预处理：修复一些极其常见的 LLM 错误
     potential_json = text[start_idx:].strip()
     
     # remove comments safely
     potential_json = _strip_comments(potential_json)
     
-    # b. 修复缺失开头引号的键:  nodes": [  -> "nodes": [
-    # 匹配模式: (空白或换行) 单词 紧跟引号和冒号
-    potential_json = re.sub(r'([\{\,]\s*)([a-zA-Z_]\w*)\"\s*:', r'\1"\2":', potential_json)
-    
-    # c. 修复缺失末尾引号的键:  "nodes: [ -> "nodes": [
-    potential_json = re.sub(r'([\{\,]\s*)\"([a-zA-Z_]\w*)\s*:', r'\1"\2":', potential_json)
-
-    # d. 修复完全缺失引号的键: nodes: [ -> "nodes": [
-    # 注意避免匹配到像 http:// 这种内容，所以限定在 { 或 , 之后
-    potential_json = re.sub(r'([\{\,]\s*)([a-zA-Z_]\w*)\s*:', r'\1"\2":', potential_json)
+    # b/c/d. 一次扫描修复键名引号:
+    #   nodes": [  -> "nodes": [   (缺失开头引号)
+    #   "nodes: [  -> "nodes": [   (缺失末尾引号)
+    #   nodes: [   -> "nodes": [   (完全缺失引号)
+    potential_json = _KEY_FIX_RE.sub(r'\1"\2":', potential_json)
     
     # 3. 使用 raw_decode 尝试解析
     decoder = json.JSONDecoder()
     
     # 首先尝试直接解析（不做任何预处理）
     try:
-        obj = json.loads(potential_json)
+        obj = _loads(potential_json)
         return obj
-    except json.JSONDecodeError:
+    except json.JSONDecodeError:  # orjson.JSONDecodeError 是其子类
         pass
     
     # 简单预处理：移除对象/列表末位多余逗号
-    processed_json = re.sub(r',\s*([\]}])', r'\1', potential_json)
+    processed_json = _TRAIL_COMMA_RE.sub(r'\1', potential_json)
     
     try:
         obj, end_pos = decoder.raw_decode(processed_json)
@@ -1,8 +1,8 @@
-import torch
 import pandas as pd
 import numpy as np
+import threading
 from datetime import datetime
-from typing import List, Optional
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional
 from loguru import logger
 from pandas.tseries.offsets import BusinessDay
 from dotenv import load_dotenv
@@ -18,10 +18,24 @@ if KRONOS_DIR not in sys.path:
     sys.path.append(KRONOS_DIR)
 
 import glob
-from sentence_transformers import SentenceTransformer
 
-from utils.predictor.model import Kronos, KronosTokenizer, KronosPredictor
-from schema.models import KLinePoint
+from schema.models import KLinePoint, KLINE_POINTS_ADAPTER
+
+# torch / sentence_transformers / Kronos 在首次构造 KronosPredictorUtility 时才导入，
+# 仅导入本模块（如 agents 包初始化）不付出数秒的加载开销
+if TYPE_CHECKING:
+    import torch
+
+# 已加载的权重按 (类型, 仓库, 设备) 缓存；加载过程由锁串行化，避免并发首次构造重复加载
+_MODEL_CACHE: Dict[tuple, Any] = {}
+_MODEL_LOCK = threading.Lock()
+
+
+def _cached_load(key: tuple, load: Callable[[], Any]) -> Any:
+    """返回 key 对应的已加载对象，未命中时调用 load（调用方需持有 _MODEL_LOCK）"""
+    if key not in _MODEL_CACHE:
+        _MODEL_CACHE[key] = load()
+    return _MODEL_CACHE[key]
 
 class KronosPredictorUtility:
     """
@@ -30,6 +44,7 @@ class KronosPredictorUtility:
     """
     _instance = None
     _predictor = None
+    _autocast_dtype = None
 
     def __new__(cls, *args, **kwargs):
         if not cls._instance:
@@ -39,8 +54,20 @@ class KronosPredictorUtility:
     def __init__(self, device: Optional[str] = None):
         if self._predictor is not None:
             return
-            
+        # 双重检查：并发的首次构造只有一个线程执行加载，其余线程等待后直接返回
+        with _MODEL_LOCK:
+            if self._predictor is None:
+                self._load(device)
+
+    def _load(self, device: Optional[str] = None):
         try:
+            import torch
+            from sentence_transformers import SentenceTransformer
+            from utils.predictor.model import Kronos, KronosTokenizer, KronosPredictor
+            
+            # Ampere 及以上 GPU 的 FP32 矩阵乘允许走 TF32
+            torch.set_float32_matmul_precision("high")
+            
             if not device:
                 device = "cuda" if torch.cuda.is_available() else "mps" if torch.backends.mps.is_available() else "cpu"
             
@@ -48,20 +75,25 @@ class KronosPredictorUtility:
             
             # 1. Load Embedder (SentenceTransformer)
             model_name = os.getenv('EMBEDDING_MODEL', 'sentence-transformers/all-MiniLM-L6-v2')  # Match training
-            try:
-                self.embedder = SentenceTransformer(model_name, device=device, local_files_only=True)
-            except Exception:
-                logger.warning(f"⚠️ Local embedder {model_name} not found. Downloading...")
-                self.embedder = SentenceTransformer(model_name, device=device)
+            def load_embedder():
+                try:
+                    return SentenceTransformer(model_name, device=device, local_files_only=True)
+                except Exception:
+                    logger.warning(f"⚠️ Local embedder {model_name} not found. Downloading...")
+                    return SentenceTransformer(model_name, device=device)
+            self.embedder = _cached_load(("embedder", model_name, device), load_embedder)
 
             # 2. Load Kronos Base
-            try:
-                tokenizer = KronosTokenizer.from_pretrained("NeoQuasar/Kronos-Tokenizer-base", local_files_only=True)
-                model = Kronos.from_pretrained("NeoQuasar/Kronos-base", local_files_only=True)
-            except Exception:
-                logger.warning("⚠️ Local Kronos cache not found. Attempting to download...")
-                tokenizer = KronosTokenizer.from_pretrained("NeoQuasar/Kronos-Tokenizer-base")
-                model = Kronos.from_pretrained("NeoQuasar/Kronos-base")
+            def load_kronos():
+                try:
+                    return (KronosTokenizer.from_pretrained("NeoQuasar/Kronos-Tokenizer-base", local_files_only=True),
+                            Kronos.from_pretrained("NeoQuasar/Kronos-base", local_files_only=True))
+                except Exception:
+                    logger.warning("⚠️ Local Kronos cache not found. Attempting to download...")
+                    return (KronosTokenizer.from_pretrained("NeoQuasar/Kronos-Tokenizer-base"),
+                            Kronos.from_pretrained("NeoQuasar/Kronos-base"))
+            # 后续的设备迁移/权重加载均为原地操作，重复执行时是幂等的
+            tokenizer, model = _cached_load(("kronos", "NeoQuasar/Kronos-base", device), load_kronos)
             
             # 3. Load Trained News Projector Weights
             # Check exports/models directory
@@ -103,14 +135,64 @@ class KronosPredictorUtility:
             
             tokenizer = tokenizer.to(device)
             model = model.to(device)
+            # 仅做推理：关闭 dropout 并冻结参数，免去 autograd 记录
+            for module in (tokenizer, model):
+                module.eval()
+                module.requires_grad_(False)
+            
+            # 解码受显存带宽限制：CUDA 上以 bf16 存放 Kronos 权重，权重读取量减半；
+            # tokenizer 的二值量化对数值敏感，保持 FP32
+            self._autocast_dtype = self._select_dtype(device)
+            if self._autocast_dtype is not None:
+                model = model.to(dtype=self._autocast_dtype)
+                logger.info(f"⚡ Kronos weights cast to {self._autocast_dtype}")
             
             self._predictor = KronosPredictor(model, tokenizer, device=device, max_context=512)
+            if device.startswith("cuda") and os.getenv("KRONOS_COMPILE", "0") == "1":
+                self._compile_decoder(model)
             logger.info("✅ Kronos Model loaded successfully.")
         except Exception as e:
             logger.error(f"❌ Failed to load Kronos Model: {e}")
             self._predictor = None
             self.has_news_model = False
 
+    @staticmethod
+    def _select_dtype(device: str) -> Optional["torch.dtype"]:
+        """
+        按 KRONOS_DTYPE（auto / bfloat16 / float32）选择推理精度，返回 None 表示保持 FP32
+        
+        auto 仅在支持 bf16 的 CUDA 设备上启用；MPS 的 autocast 支持随 PyTorch 版本而异，保持 FP32。
+        """
+        import torch
+        
+        choice = os.getenv("KRONOS_DTYPE", "auto").lower()
+        if choice == "float32" or not device.startswith("cuda"):
+            return None
+        if choice in ("auto", "bfloat16") and torch.cuda.is_bf16_supported():
+            return torch.bfloat16
+        return None
+
+    @staticmethod
+    def _compile_decoder(model) -> None:
+        """
+        用 torch.compile(mode="reduce-overhead") 包装逐步解码函数（CUDA Graph 重放）
+        
+        batch=1 的自回归解码每步都是大量小 kernel，耗时主要在 CPU 端发射；
+        图重放把一步解码合并为一次提交。每个新的序列长度首次调用需要编译，
+        因此仅在 KRONOS_COMPILE=1 时启用，适合长驻服务进程。
+        """
+        import torch
+        
+        if not hasattr(torch, "compile"):
+            logger.warning("⚠️ torch.compile requires PyTorch 2.x, using eager decoder.")
+            return
+        try:
+            model.decode_s1 = torch.compile(model.decode_s1, mode="reduce-overhead")
+            model.decode_s2 = torch.compile(model.decode_s2, mode="reduce-overhead")
+            logger.info("⚡ Kronos decoder compiled (reduce-overhead).")
+        except Exception as e:
+            logger.warning(f"⚠️ Failed to compile Kronos decoder, using eager mode: {e}")
+
     def get_base_forecast(self, df: pd.DataFrame, lookback: int = 20, pred_len: int = 5, news_text: Optional[str] = None) -> List[KLinePoint]:
         """
         生成原始模型预测
@@ -142,33 +224,35 @@ class KronosPredictorUtility:
             except Exception as e:
                 logger.error(f"Failed to encode news: {e}")
 
+        import torch
+        
         try:
             # 预测所需的列
             cols = ['open', 'high', 'low', 'close', 'volume']
-            pred_df = self._predictor.predict(
-                df=x_df[cols],
-                x_timestamp=x_timestamp,
-                y_timestamp=y_timestamp,
-                pred_len=pred_len,
-                T=1.0, 
-                top_p=0.9, 
-                sample_count=1,
-                verbose=False,
-                news_emb=news_emb
-            )
+            # 低精度权重下由 autocast 统一输入/中间结果的 dtype
+            with torch.inference_mode(), torch.autocast(
+                device_type="cuda", dtype=self._autocast_dtype or torch.bfloat16,
+                enabled=self._autocast_dtype is not None,
+            ):
+                pred_df = self._predictor.predict(
+                    df=x_df[cols],
+                    x_timestamp=x_timestamp,
+                    y_timestamp=y_timestamp,
+                    pred_len=pred_len,
+                    T=1.0, 
+                    top_p=0.9, 
+                    sample_count=1,
+                    verbose=False,
+                    news_emb=news_emb
+                )
             
-            # 转换为 KLinePoint
-            results = []
-            for date, row in pred_df.iterrows():
-                results.append(KLinePoint(
-                    date=date.strftime("%Y-%m-%d"),
-                    open=float(row['open']),
-                    high=float(row['high']),
-                    low=float(row['low']),
-                    close=float(row['close']),
-                    volume=float(row['volume'])
-                ))
-            return results
+            # 转换为 KLinePoint：整列取值后批量校验，替代 iterrows 逐行装箱为 Series
+            records = (
+                pred_df[cols].astype(np.float64)
+                .assign(date=pred_df.index.strftime("%Y-%m-%d"))
+                .to_dict("records")
+            )
+            return KLINE_POINTS_ADAPTER.validate_python(records)
         except Exception as e:
             logger.error(f"Forecast generation failed: {e}")
             return []
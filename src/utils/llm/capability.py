@@ -1,4 +1,5 @@
 import os
+import threading
 from typing import Optional, List, Dict, Any
 from agno.agent import Agent
 from agno.models.base import Model
@@ -49,19 +50,30 @@ class ModelCapabilityRegistry:
     """
     模型能力注册表，用于缓存和管理不同模型的能力测试结果。
     """
-    _cache = {}
+    # (provider, model_id, 排序后的 kwargs) -> 能力；同名模型部署在不同 host 时分别测试
+    _cache: Dict[tuple, Dict[str, bool]] = {}
+    _lock = threading.Lock()
+
+    @staticmethod
+    def _cache_key(provider: str, model_id: str, kwargs: Dict[str, Any]) -> tuple:
+        return provider, model_id, tuple(sorted((k, repr(v)) for k, v in kwargs.items()))
 
     @classmethod
     def get_capabilities(cls, provider: str, model_id: str, **kwargs) -> Dict[str, bool]:
-        key = f"{provider}:{model_id}"
-        if key not in cls._cache:
-            logger.info(f"🔍 Testing capabilities for {key}...")
-            model = get_model(provider, model_id, **kwargs)
-            supports_tool_call = test_tool_call_support(model)
-            cls._cache[key] = {
-                "supports_tool_call": supports_tool_call
-            }
-        return cls._cache[key]
+        key = cls._cache_key(provider, model_id, kwargs)
+        cached = cls._cache.get(key)
+        if cached is not None:
+            return cached
+        # 能力测试需要真实调用一次模型：加锁避免并发首次查询重复测试
+        with cls._lock:
+            if key not in cls._cache:
+                logger.info(f"🔍 Testing capabilities for {provider}:{model_id}...")
+                model = get_model(provider, model_id, **kwargs)
+                supports_tool_call = test_tool_call_support(model)
+                cls._cache[key] = {
+                    "supports_tool_call": supports_tool_call
+                }
+            return cls._cache[key]
 
 if __name__ == "__main__":
     # 简单测试脚本
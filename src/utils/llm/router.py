@@ -1,4 +1,5 @@
 import os
+from functools import lru_cache
 from typing import Optional, List, Dict, Any, Union
 from agno.models.base import Model
 from loguru import logger
@@ -6,9 +7,6 @@ from dotenv import load_dotenv
 from utils.llm.factory import get_model
 from utils.llm.capability import ModelCapabilityRegistry
 
-# 确保在初始化前加载环境变量
-load_dotenv()
-
 class ModelRouter:
     """
     模型路由管理器
@@ -63,5 +61,16 @@ class ModelRouter:
             return self.get_tool_model(**kwargs)
         return self.get_reasoning_model(**kwargs)
 
-# 全局单例
-router = ModelRouter()
+@lru_cache(maxsize=None)
+def get_router() -> ModelRouter:
+    """返回全局单例；首次调用时才加载环境变量并构造，仅导入本模块不产生任何初始化开销"""
+    # 确保在初始化前加载环境变量
+    load_dotenv()
+    return ModelRouter()
+
+
+def __getattr__(name: str):
+    # 兼容旧写法 `from utils.llm.router import router`
+    if name == "router":
+        return get_router()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1,18 +1,47 @@
 import requests
+from requests.adapters import HTTPAdapter
 from requests.exceptions import RequestException, Timeout
-import json
+from urllib3.util.retry import Retry
+import threading
 import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from typing import List, Dict, Optional
+from types import MappingProxyType
+from typing import List, Dict, Optional, Tuple
 from loguru import logger
 from utils.database_manager import DatabaseManager
 from utils.content_extractor import ContentExtractor
+from utils.json_utils import _loads
+
+# (连接超时, 读取超时)：连不上时快速失败；读取上限 15s，加上一次重试后单个源最坏约 30s
+_HTTP_TIMEOUT = (3.05, 15)
+
+
+def _make_session() -> requests.Session:
+    """带连接池的共享会话：复用 TCP/TLS 连接，502/503/504 与连接错误快速重试一次"""
+    session = requests.Session()
+    retry = Retry(total=1, backoff_factor=0.1, status_forcelist=[502, 503, 504], raise_on_status=False)
+    adapter = HTTPAdapter(pool_connections=16, pool_maxsize=32, max_retries=retry)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+# 模块级单例，所有 NewsNowTools / PolymarketTools 实例共享连接池
+_SESSION = _make_session()
+
+
+def _parse_json(response: requests.Response):
+    """直接解析响应的原始字节（安装了 orjson 时由其解码），省去 response.json() 的编码探测与解码"""
+    return _loads(response.content)
 
 class NewsNowTools:
     """热点新闻获取工具 - 接入 NewsNow API 与 Jina 内容提取"""
     
     BASE_URL = "https://newsnow.busiyi.world"
-    SOURCES = {
+    # 只读映射：各实例与 toolkits 共享，不可被意外修改
+    SOURCES = MappingProxyType({
         # 金融类
         "cls": "财联社",
         "wallstreetcn": "华尔街见闻",
@@ -30,8 +59,12 @@ class NewsNowTools:
         "v2ex": "V2EX",
         "juejin": "掘金",
         "hackernews": "Hacker News",
-    }
-
+    })
+    _VALID_SOURCES = frozenset(SOURCES)
+    
+    # 热点缓存：5 分钟有效期，最多保留 128 个 (源, 条数) 组合
+    _CACHE_TTL = 300
+    _CACHE_MAXSIZE = 128
 
     def __init__(self, db: DatabaseManager):
         self.db = db
@@ -39,78 +72,113 @@ class NewsNowTools:
             "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) "
             "AppleWebKit/537.36 (KHTML, like Gecko) Chrome/131.0.0.0 Safari/537.36"
         )
+        self.session = _SESSION
         self.extractor = ContentExtractor()
-        # Simple in-memory cache: source_id -> {"time": timestamp, "data": []}
-        self._cache = {}
+        # 有界 LRU 缓存: f"{source_id}_{count}" -> {"time": timestamp, "data": []}
+        # 过期条目不主动删除（仍受容量约束），供接口失败时作为陈旧数据兜底
+        self._cache: "OrderedDict[str, Dict]" = OrderedDict()
+        self._cache_lock = threading.Lock()
+
+    def _cache_get(self, key: str) -> Optional[Dict]:
+        with self._cache_lock:
+            cached = self._cache.get(key)
+            if cached is not None:
+                self._cache.move_to_end(key)
+            return cached
+
+    def _cache_put(self, key: str, entry: Dict) -> None:
+        with self._cache_lock:
+            self._cache[key] = entry
+            self._cache.move_to_end(key)
+            while len(self._cache) > self._CACHE_MAXSIZE:
+                self._cache.popitem(last=False)
 
     def fetch_hot_news(self, source_id: str, count: int = 15, fetch_content: bool = False) -> List[Dict]:
         """
         从指定新闻源获取热点新闻列表（支持5分钟缓存）。
         """
+        items, fresh = self._fetch_hot_news(source_id, count, fetch_content)
+        if fresh:
+            self.db.save_daily_news(items)
+        return items
+
+    def _fetch_hot_news(self, source_id: str, count: int, fetch_content: bool) -> Tuple[List[Dict], bool]:
+        """拉取（或命中缓存）热点列表，不写库；返回 (条目, 是否为新拉取的数据)，由调用方决定何时落库"""
+        # 未知源（如 LLM 编造的 ID）直接拒绝，不必等一次注定失败的请求超时
+        if source_id not in self._VALID_SOURCES:
+            logger.error(f"Unknown NewsNow source: {source_id}. Available: {list(self.SOURCES)}")
+            return [], False
         # 1. Check cache validity (5 minutes)
         cache_key = f"{source_id}_{count}"
-        cached = self._cache.get(cache_key)
+        cached = self._cache_get(cache_key)
         now = time.time()
         
-        if cached and (now - cached["time"] < 300):
+        if cached and (now - cached["time"] < self._CACHE_TTL):
             logger.info(f"⚡ Using cached news for {source_id} (Age: {int(now - cached['time'])}s)")
-            return cached["data"]
+            return cached["data"], False
 
         try:
             url = f"{self.BASE_URL}/api/s?id={source_id}"
-            response = requests.get(url, headers={"User-Agent": self.user_agent}, timeout=30)
+            response = self.session.get(url, headers={"User-Agent": self.user_agent}, timeout=_HTTP_TIMEOUT)
             if response.status_code == 200:
-                data = response.json()
+                data = _parse_json(response)
                 items = data.get("items", [])[:count]
-                processed_items = []
-                for i, item in enumerate(items, 1):
-                    item_url = item.get("url", "")
-                    content = ""
-                    if fetch_content and item_url:
-                        content = self.extractor.extract_with_jina(item_url) or ""
-                    
-                    processed_items.append({
-                        "id": item.get("id") or f"{source_id}_{int(time.time())}_{i}",
-                        "source": source_id,
-                        "rank": i,
-                        "title": item.get("title", ""),
-                        "url": item_url,
-                        "content": content,
-                        "publish_time": item.get("publish_time"),
-                        "meta_data": item.get("extra", {})
-                    })
+                urls = [item.get("url", "") for item in items]
+                # 正文抽取并发执行，总耗时由逐条之和降为最慢的一条（速率限制仍由 ContentExtractor 统一控制）
+                contents = self.extractor.extract_batch(urls) if fetch_content else [""] * len(items)
+                processed_items = self._normalize_items(source_id, items, urls, contents)
                 
                 # Update Cache
-                self._cache[cache_key] = {"time": now, "data": processed_items}
+                self._cache_put(cache_key, {"time": now, "data": processed_items})
                 logger.info(f"✅ Fetched and cached news for {source_id}")
-                
-                self.db.save_daily_news(processed_items)
-                return processed_items
+                return processed_items, True
             else:
                 logger.error(f"NewsNow API Error: {response.status_code}")
                 # Fallback to stale cache if available
                 if cached:
                     logger.warning(f"⚠️ API failed, using stale cache for {source_id}")
-                    return cached["data"]
-                return []
+                    return cached["data"], False
+                return [], False
         except Timeout:
             logger.error(f"Timeout fetching hot news from {source_id}")
             if cached:
                 logger.warning(f"⚠️ Timeout, using stale cache for {source_id}")
-                return cached["data"]
-            return []
+                return cached["data"], False
+            return [], False
         except RequestException as e:
             logger.error(f"Network error fetching hot news from {source_id}: {e}")
             if cached:
                  logger.warning(f"⚠️ Network check failed, using stale cache for {source_id}")
-                 return cached["data"]
-            return []
-        except json.JSONDecodeError:
+                 return cached["data"], False
+            return [], False
+        except ValueError:  # json / orjson 的 JSONDecodeError 均为 ValueError 子类
             logger.error(f"Failed to parse JSON response from NewsNow for {source_id}")
-            return []
+            return [], False
         except Exception as e:
             logger.error(f"Unexpected error fetching hot news from {source_id}: {e}")
-            return []
+            return [], False
+
+    @staticmethod
+    def _normalize_items(source_id: str, items: List[Dict], urls: List[str], contents: List[str]) -> List[Dict]:
+        """
+        将 NewsNow 原始条目转换为入库结构
+        
+        各源条目的字段形状一致，因此不按源生成专用解析器；缺省 ID 的时间戳前缀每批只取一次。
+        """
+        id_prefix = f"{source_id}_{int(time.time())}_"
+        return [
+            {
+                "id": item.get("id") or f"{id_prefix}{i}",
+                "source": source_id,
+                "rank": i,
+                "title": item.get("title", ""),
+                "url": item_url,
+                "content": content,
+                "publish_time": item.get("publish_time"),
+                "meta_data": item.get("extra", {}),
+            }
+            for i, (item, item_url, content) in enumerate(zip(items, urls, contents), 1)
+        ]
 
     def fetch_news_content(self, url: str) -> Optional[str]:
         """
@@ -124,6 +192,14 @@ class NewsNowTools:
         """
         return self.extractor.extract_with_jina(url)
 
+    def fetch_news_contents(self, urls: List[str]) -> List[str]:
+        """
+        并发抓取多个 URL 的正文内容（共享连接池），结果与 urls 一一对应，失败为空串。
+        
+        基于线程池，可在 Agent 工具等已运行事件循环的上下文中调用。
+        """
+        return self.extractor.extract_batch(urls)
+
     def get_unified_trends(self, sources: Optional[List[str]] = None) -> str:
         """
         获取多平台综合热点报告，自动聚合多个新闻源的热门内容。
@@ -138,35 +214,39 @@ class NewsNowTools:
             格式化的 Markdown 热点汇总报告，包含各平台 Top 10 热点标题和链接。
         """
         sources = sources or ["weibo", "zhihu", "wallstreetcn"]
-        all_news = []
-        for src in sources:
-            all_news.extend(self.fetch_hot_news(src))
-            time.sleep(0.2)
+        # 各源请求互不依赖，并发拉取：总耗时由各源之和降为最慢的一个
+        with ThreadPoolExecutor(max_workers=min(len(sources), 8)) as executor:
+            fetched = list(executor.map(lambda src: self._fetch_hot_news(src, 15, False), sources))
+        # 各源新拉取的条目合并为一次批量写入（单个事务），而非每个源各写一次
+        fresh_news = [n for news, fresh in fetched if fresh for n in news]
+        if fresh_news:
+            self.db.save_daily_news(fresh_news)
         
-        if not all_news:
+        # 结果按源分桶（与 sources 一一对应），报告直接取各自的桶，无需合并后再按 source 过滤
+        if not any(news for news, _ in fetched):
             return "❌ 未能获取到热点数据"
             
-        report = f"# 实时全网热点汇总 ({datetime.now().strftime('%Y-%m-%d %H:%M')})\n\n"
-        for src in sources:
-
-            src_name = self.SOURCES.get(src, src)
-            report += f"### 🔥 {src_name}\n"
-            src_news = [n for n in all_news if n['source'] == src]
-            for n in src_news[:10]:
-                report += f"- {n['title']} ([链接]({n['url']}))\n"
-            report += "\n"
+        # 逐行收集后一次 join，避免长报告反复 += 拼接
+        parts = [f"# 实时全网热点汇总 ({datetime.now().strftime('%Y-%m-%d %H:%M')})", ""]
+        for src, (news, _) in zip(sources, fetched):
+            parts.append(f"### 🔥 {self.SOURCES.get(src, src)}")
+            parts.extend(f"- {n['title']} ([链接]({n['url']}))" for n in news[:10])
+            parts.append("")
             
-        return report
+        return "\n".join(parts) + "\n"
 
 
 class PolymarketTools:
     """Polymarket 预测市场数据工具 - 获取热门预测市场反映公众情绪和预期"""
     
     BASE_URL = "https://gamma-api.polymarket.com"
+    # 市场对象字段很多，只保留下游用到的这几项
+    _MARKET_FIELDS = ("id", "question", "slug", "outcomes", "outcomePrices", "volume", "liquidity")
     
     def __init__(self, db: DatabaseManager):
         self.db = db
         self.user_agent = "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36"
+        self.session = _SESSION
     
     def get_active_markets(self, limit: int = 20) -> List[Dict]:
         """
@@ -188,26 +268,16 @@ class PolymarketTools:
             - volume: 交易量
         """
         try:
-            response = requests.get(
+            response = self.session.get(
                 f"{self.BASE_URL}/markets",
                 params={"active": "true", "closed": "false", "limit": limit},
                 headers={"User-Agent": self.user_agent, "Accept": "application/json"},
-                timeout=30
+                timeout=_HTTP_TIMEOUT
             )
             
             if response.status_code == 200:
-                markets = response.json()
-                result = []
-                for m in markets:
-                    result.append({
-                        "id": m.get("id"),
-                        "question": m.get("question"),
-                        "slug": m.get("slug"),
-                        "outcomes": m.get("outcomes"),
-                        "outcomePrices": m.get("outcomePrices"),
-                        "volume": m.get("volume"),
-                        "liquidity": m.get("liquidity"),
-                    })
+                markets = _parse_json(response)
+                result = [{field: m.get(field) for field in self._MARKET_FIELDS} for m in markets]
                 logger.info(f"✅ 获取 {len(result)} 个预测市场")
                 return result
             else:
@@ -219,7 +289,7 @@ class PolymarketTools:
         except RequestException as e:
             logger.error(f"Network error fetching Polymarket markets: {e}")
             return []
-        except json.JSONDecodeError:
+        except ValueError:  # json / orjson 的 JSONDecodeError 均为 ValueError 子类
             logger.error("Failed to parse JSON response from Polymarket")
             return []
         except Exception as e:
@@ -240,17 +310,17 @@ class PolymarketTools:
         if not markets:
             return "❌ 无法获取 Polymarket 数据"
         
-        report = f"# 🔮 Polymarket 热门预测 ({datetime.now().strftime('%Y-%m-%d %H:%M')})\n\n"
+        parts = [f"# 🔮 Polymarket 热门预测 ({datetime.now().strftime('%Y-%m-%d %H:%M')})", ""]
         for i, m in enumerate(markets, 1):
             question = m.get("question", "Unknown")
             prices = m.get("outcomePrices", [])
             volume = m.get("volume", 0)
             
-            report += f"**{i}. {question}**\n"
+            parts.append(f"**{i}. {question}**")
             if prices:
-                report += f"   概率: {prices}\n"
+                parts.append(f"   概率: {prices}")
             if volume:
-                report += f"   交易量: ${float(volume):,.0f}\n"
-            report += "\n"
+                parts.append(f"   交易量: ${float(volume):,.0f}")
+            parts.append("")
         
-        return report
+        return "\n".join(parts) + "\n"
@@ -1,34 +1,106 @@
 # Ref: https://github.com/shiyu-coder/Kronos
 
-from model import Kronos, KronosTokenizer, KronosPredictor
+# torch / Kronos / matplotlib / numba 均在使用处按需导入：仅导入本模块（如只用 load_data）时不付出数秒的加载开销
+import io
+import queue
 import pandas as pd
 import sqlite3
-import torch
-import matplotlib.pyplot as plt
-import matplotlib.gridspec as gridspec
+from functools import lru_cache
 from pandas.tseries.offsets import BusinessDay
 import numpy as np
 
 def get_device():
+    import torch
+    
     device = "cuda" if torch.cuda.is_available() else "mps" if torch.backends.mps.is_available() else "cpu"
     print(f"Using device: {device}")
     return device
 
 def load_predictor():
+    import torch
+    from model import Kronos, KronosTokenizer, KronosPredictor
+    
     tokenizer = KronosTokenizer.from_pretrained("NeoQuasar/Kronos-Tokenizer-base")
     model = Kronos.from_pretrained("NeoQuasar/Kronos-base")
     device = get_device()
     tokenizer = tokenizer.to(device)
     model = model.to(device)
+    if device == "cuda" and torch.cuda.is_bf16_supported():
+        # bf16 权重使解码读取的权重字节数减半；推理时需配合 torch.autocast
+        model = model.to(dtype=torch.bfloat16)
     return KronosPredictor(model, tokenizer, device=device, max_context=512)
 
+def inference_context(predictor):
+    """按模型权重精度决定是否开启 autocast（bf16 权重需配合 autocast 推理）"""
+    import torch
+    
+    dtype = next(predictor.model.parameters()).dtype
+    return torch.autocast(device_type="cuda", dtype=dtype, enabled=dtype != torch.float32)
+
 def load_data(ticker="002111", db_path="AlphaEar/data/signal_flux.db"):
     with sqlite3.connect(db_path) as conn:
-        df = pd.read_sql_query(f"SELECT * FROM stock_prices WHERE ticker = '{ticker}'", conn)
-    df['date'] = pd.to_datetime(df['date'])
-    df = df.sort_values('date').reset_index(drop=True)
+        # 只取回测/预测用到的列；按主键 (ticker, date) 顺序读出，无需再在 pandas 中排序。
+        # stock_prices.date 存储为秒级时间戳，直接按 unit='s' 解析
+        df = pd.read_sql_query(
+            "SELECT date, open, high, low, close, volume FROM stock_prices WHERE ticker = ? ORDER BY date",
+            conn, params=(ticker,),
+            parse_dates={'date': {'unit': 's'}},
+            dtype={'open': 'float32', 'high': 'float32', 'low': 'float32', 'close': 'float32', 'volume': 'float64'},
+        )
     return df
 
+def _candle_geometry_py(opens, closes, min_height):
+    heights = np.abs(closes - opens)
+    if min_height:
+        heights = np.where(heights == 0, min_height, heights)
+    return np.minimum(opens, closes), heights, closes >= opens
+
+def _candle_geometry_loop(opens, closes, min_height):
+    n = opens.shape[0]
+    bottoms = np.empty(n, np.float64)
+    heights = np.empty(n, np.float64)
+    up = np.empty(n, np.bool_)
+    for i in range(n):
+        o, c = opens[i], closes[i]
+        up[i] = c >= o
+        bottoms[i] = min(o, c)
+        h = abs(c - o)
+        heights[i] = min_height if h == 0 else h
+    return bottoms, heights, up
+
+@lru_cache(maxsize=None)
+def _candle_geometry_impl():
+    """首次绘图时才导入 numba 并编译逐根循环；未安装 numba 时使用 NumPy 实现"""
+    try:
+        from numba import njit
+    except ImportError:
+        return _candle_geometry_py
+    return njit(cache=True)(_candle_geometry_loop)
+
+def compute_candle_geometry(opens, closes, min_height=0.0):
+    """返回实体的 (底部, 高度, 是否阳线) 数组；min_height 为零高度实体的可视高度"""
+    return _candle_geometry_impl()(np.asarray(opens, dtype=np.float64), np.asarray(closes, dtype=np.float64),
+                            float(min_height))
+
+def draw_candles(ax, x, opens, highs, lows, closes, color_up, color_down, width=0.6, fill=True, alpha=1.0,
+                 linewidth=None, linestyle='-', min_height=0.0):
+    """
+    以集合批量绘制影线与实体：影线一次 vlines（LineCollection），实体一个 PatchCollection，
+    绘制调用从每根 K 线一次降为常数次。返回每根 K 线的颜色，供成交量柱复用
+    """
+    from matplotlib.collections import PatchCollection
+    from matplotlib.patches import Rectangle
+    
+    bottoms, heights, up = compute_candle_geometry(opens, closes, min_height)
+    colors = np.where(up, color_up, color_down).tolist()
+    ax.vlines(x, lows, highs, colors=colors, linewidth=linewidth, alpha=alpha, linestyle=linestyle)
+    
+    rects = [Rectangle((xi - width / 2, b), width, h) for xi, b, h in zip(x, bottoms, heights)]
+    ax.add_collection(PatchCollection(rects, edgecolor=colors, facecolor=colors if fill else 'none',
+                                      alpha=alpha, linewidth=linewidth, linestyle=linestyle))
+    ax.autoscale_view()
+    return colors
+
 def plot_kline_matplotlib(ax, ax_vol, dates, df, label_suffix="", color_up='#ef4444', color_down='#22c55e', alpha=1.0, is_prediction=False):
     """
     绘制 K 线图和成交量
@@ -45,42 +117,56 @@ def plot_kline_matplotlib(ax, ax_vol, dates, df, label_suffix="", color_up='#ef4
     
     # Width of the candlestick
     width = 0.6
+    linestyle = '--' if is_prediction else '-'
     
-    for i in range(len(x)):
-        color = color_up if closes[i] >= opens[i] else color_down
-        linestyle = '--' if is_prediction else '-'
-        
-        # Wick
-        ax.vlines(x[i], lows[i], highs[i], color=color, linewidth=1, alpha=alpha, linestyle=linestyle)
-        
-        # Body
-        rect_bottom = min(opens[i], closes[i])
-        rect_height = abs(opens[i] - closes[i])
-        if rect_height == 0: rect_height = 0.001 # Visual hair
-        
-        ax.add_patch(plt.Rectangle((x[i] - width/2, rect_bottom), width, rect_height, 
-                                 edgecolor=color, facecolor=color if not is_prediction else 'none', 
-                                 alpha=alpha, linewidth=1, linestyle=linestyle))
+    colors = draw_candles(ax, x, opens, highs, lows, closes, color_up, color_down, width=width, fill=not is_prediction,
+                          alpha=alpha, linewidth=1, linestyle=linestyle, min_height=0.001) # Visual hair
+    
+    # Volume
+    ax_vol.bar(x, volumes, color=colors, alpha=alpha * 0.5, width=width)
+
+# 复用的 Agg 画布：长驻服务中每次出图免去 Figure/Canvas 的创建开销
+_FIG_POOL = queue.LifoQueue()
+
+def _acquire_figure():
+    """从池中取出一张已清空的图，池为空时新建；直接使用 Figure + Agg 画布，不依赖 pyplot 及 GUI 后端"""
+    try:
+        return _FIG_POOL.get_nowait()
+    except queue.Empty:
+        from matplotlib.figure import Figure
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
         
-        # Volume
-        ax_vol.bar(x[i], volumes[i], color=color, alpha=alpha * 0.5, width=width)
+        fig = Figure(figsize=(14, 8), facecolor='white')
+        FigureCanvasAgg(fig)
+        return fig
+
+def _release_figure(fig):
+    fig.clf()
+    _FIG_POOL.put(fig)
 
-def render_comparison_chart(history_df, actual_df, pred_df, title):
+def render_comparison_chart(history_df, actual_df, pred_df, title, dpi=100):
     """
-    渲染组合图：历史 K 线 + 真值 K 线 + 预测 K 线
+    渲染组合图：历史 K 线 + 真值 K 线 + 预测 K 线，返回 PNG 字节
     """
-    # Combine all dates for X axis
-    all_dates = pd.concat([history_df['date'], actual_df['date'] if actual_df is not None else pred_df.index.to_series()]).unique()
-    all_dates = sorted(all_dates)
-    date_to_idx = {date: i for i, date in enumerate(all_dates)}
+    # Combine all dates for X axis (np.unique 返回已排序的去重结果)
+    future_dates = actual_df['date'].values if actual_df is not None else pred_df.index.values
+    all_dates = np.unique(np.concatenate([history_df['date'].values, future_dates]))
+    
+    fig = _acquire_figure()
+    try:
+        return _draw_comparison(fig, all_dates, history_df, actual_df, pred_df, title, dpi)
+    finally:
+        _release_figure(fig)
+
+def _draw_comparison(fig, all_dates, history_df, actual_df, pred_df, title, dpi):
+    import matplotlib.gridspec as gridspec
     
-    fig = plt.figure(figsize=(14, 8), facecolor='white')
     gs = gridspec.GridSpec(2, 1, height_ratios=[3, 1], hspace=0.1)
     ax_main = fig.add_subplot(gs[0])
     ax_vol = fig.add_subplot(gs[1], sharex=ax_main)
     
     # 1. Plot History
-    hist_indices = [date_to_idx[d] for d in history_df['date']]
+    hist_indices = np.searchsorted(all_dates, history_df['date'].values)
     # We use a custom x for plotting to ensure continuity
     plot_kline_matplotlib(ax_main, ax_vol, history_df['date'], history_df, alpha=0.8)
     
@@ -90,31 +176,21 @@ def render_comparison_chart(history_df, actual_df, pred_df, title):
     if actual_df is not None:
         # Shift indices
         actual_x = np.arange(len(actual_df)) + offset
-        # Plotting manually to handle offset
-        for i in range(len(actual_df)):
-            idx = actual_x[i]
-            row = actual_df.iloc[i]
-            color = '#ef4444' if row['close'] >= row['open'] else '#22c55e'
-            ax_main.vlines(idx, row['low'], row['high'], color=color, linewidth=1, alpha=0.9)
-            ax_main.add_patch(plt.Rectangle((idx - 0.3, min(row['open'], row['close'])), 0.6, abs(row['open']-row['close']), 
-                                         edgecolor=color, facecolor=color, alpha=0.9))
-            ax_vol.bar(idx, row['volume'], color=color, alpha=0.4)
+        colors = draw_candles(ax_main, actual_x, actual_df['open'].values, actual_df['high'].values,
+                              actual_df['low'].values, actual_df['close'].values, '#ef4444', '#22c55e', alpha=0.9)
+        ax_vol.bar(actual_x, actual_df['volume'].values, color=colors, alpha=0.4)
             
     # 3. Plot Prediction
     pred_x = np.arange(len(pred_df)) + offset
-    for i in range(len(pred_df)):
-        idx = pred_x[i]
-        row = pred_df.iloc[i]
-        color = '#ff8c00' # Orange for prediction to distinguish
-        ax_main.vlines(idx, row['low'], row['high'], color=color, linewidth=1.5, linestyle='--')
-        ax_main.add_patch(plt.Rectangle((idx - 0.3, min(row['open'], row['close'])), 0.6, abs(row['open']-row['close']), 
-                                     edgecolor=color, facecolor='none', linewidth=1.5, linestyle='--'))
-        # Plot secondary prediction line for close
-        if i == 0:
-            # Connect to history
-            ax_main.plot([offset-1, idx], [history_df['close'].iloc[-1], row['close']], color=color, linestyle='--', alpha=0.6)
-        elif i > 0:
-            ax_main.plot([idx-1, idx], [pred_df['close'].iloc[i-1], row['close']], color=color, linestyle='--', alpha=0.6)
+    color = '#ff8c00' # Orange for prediction to distinguish
+    # 预测列一次取为 ndarray，后续绘制不再经过 DataFrame 索引器
+    pred_closes = pred_df['close'].to_numpy()
+    draw_candles(ax_main, pred_x, pred_df['open'].to_numpy(), pred_df['high'].to_numpy(), pred_df['low'].to_numpy(),
+                 pred_closes, color, color, fill=False, linewidth=1.5, linestyle='--')
+    # Plot secondary prediction line for close: 以历史最后收盘价为起点的一条折线，一次 plot 完成
+    connector_x = np.concatenate([[offset - 1], pred_x])
+    connector_y = np.concatenate([[history_df['close'].iat[-1]], pred_closes])
+    ax_main.plot(connector_x, connector_y, color=color, linestyle='--', alpha=0.6)
 
     # Styling
     ax_main.set_title(title, fontsize=14, fontweight='bold')
@@ -126,11 +202,18 @@ def render_comparison_chart(history_df, actual_df, pred_df, title):
     # Set X ticks
     step = max(1, len(all_dates) // 10)
     ax_vol.set_xticks(np.arange(0, len(all_dates), step))
-    ax_vol.set_xticklabels([all_dates[i].strftime('%Y-%m-%d') for i in range(0, len(all_dates), step)], rotation=45)
+    ax_vol.set_xticklabels(pd.to_datetime(all_dates[::step]).strftime('%Y-%m-%d'), rotation=45)
     
-    plt.tight_layout()
-    plt.show()
-    plt.close()
+    fig.tight_layout()
+    buf = io.BytesIO()
+    fig.savefig(buf, format='png', dpi=dpi)
+    return buf.getvalue()
+
+def save_chart(png, path):
+    if png is None: return
+    with open(path, 'wb') as f:
+        f.write(png)
+    print(f"Chart saved to {path}")
 
 def run_backtest(df, predictor, lookback, pred_len, start_index=0):
     total_len = len(df)
@@ -147,36 +230,38 @@ def run_backtest(df, predictor, lookback, pred_len, start_index=0):
     y_true_df = df.iloc[pred_start : pred_end].copy()
     y_timestamp = y_true_df['date']
     
-    print(f"Backtesting: {x_df['date'].iloc[0].date()} to {y_timestamp.iloc[-1].date()}")
+    print(f"Backtesting: {x_df['date'].iat[0].date()} to {y_timestamp.iat[-1].date()}")
     
-    pred_df = predictor.predict(
-        df=x_df[['open', 'high', 'low', 'close', 'volume']],
-        x_timestamp=x_df['date'],
-        y_timestamp=y_timestamp,
-        pred_len=actual_pred_len,
-        T=1.0, top_p=0.9, sample_count=1
-    )
+    with inference_context(predictor):
+        pred_df = predictor.predict(
+            df=x_df[['open', 'high', 'low', 'close', 'volume']],
+            x_timestamp=x_df['date'],
+            y_timestamp=y_timestamp,
+            pred_len=actual_pred_len,
+            T=1.0, top_p=0.9, sample_count=1
+        )
     
-    render_comparison_chart(x_df, y_true_df, pred_df, f"Backtest: {TICKER} K-Line Comparison")
+    return render_comparison_chart(x_df, y_true_df, pred_df, f"Backtest: {TICKER} K-Line Comparison")
 
 def run_forecast(df, predictor, lookback, pred_len):
     if len(df) < lookback: return
     x_df = df.iloc[-lookback:].copy()
-    last_date = x_df['date'].iloc[-1]
+    last_date = x_df['date'].iat[-1]
     future_dates = pd.date_range(start=last_date + BusinessDay(1), periods=pred_len, freq='B')
     future_dates = pd.Series(future_dates)
     
-    print(f"Forecasting: Starting from {future_dates.iloc[0].date()}")
+    print(f"Forecasting: Starting from {future_dates.iat[0].date()}")
     
-    pred_df = predictor.predict(
-        df=x_df[['open', 'high', 'low', 'close', 'volume']],
-        x_timestamp=x_df['date'],
-        y_timestamp=future_dates,
-        pred_len=pred_len,
-        T=1.0, top_p=0.9, sample_count=1
-    )
+    with inference_context(predictor):
+        pred_df = predictor.predict(
+            df=x_df[['open', 'high', 'low', 'close', 'volume']],
+            x_timestamp=x_df['date'],
+            y_timestamp=future_dates,
+            pred_len=pred_len,
+            T=1.0, top_p=0.9, sample_count=1
+        )
     
-    render_comparison_chart(x_df, None, pred_df, f"Forecast: {TICKER} Future K-Line")
+    return render_comparison_chart(x_df, None, pred_df, f"Forecast: {TICKER} Future K-Line")
 
 if __name__ == "__main__":
     LOOKBACK = 20
@@ -190,7 +275,8 @@ if __name__ == "__main__":
     backtest_start = max(0, total_rows - LOOKBACK - PRED_LEN - 10) # Leave some space to see trend
     
     print("\n--- Running Backtest ---")
-    run_backtest(stock_data, pred_model, LOOKBACK, PRED_LEN, start_index=backtest_start)
+    save_chart(run_backtest(stock_data, pred_model, LOOKBACK, PRED_LEN, start_index=backtest_start),
+               f"backtest_{TICKER}.png")
     
     print("\n--- Running Forecast ---")
-    run_forecast(stock_data, pred_model, LOOKBACK, PRED_LEN)
\ No newline at end of file
+    save_chart(run_forecast(stock_data, pred_model, LOOKBACK, PRED_LEN), f"forecast_{TICKER}.png")
\ No newline at end of file
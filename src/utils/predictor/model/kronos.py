@@ -1,3 +1,6 @@
+import hashlib
+from collections import OrderedDict
+
 import numpy as np
 import pandas as pd
 import torch
@@ -403,7 +406,15 @@ def sample_from_logits(logits, temperature=1.0, top_k=None, top_p=None, sample_l
     return x
 
 
-def auto_regressive_inference(tokenizer, model, x, x_stamp, y_stamp, max_context, pred_len, clip=5, T=1.0, top_k=0, top_p=0.99, sample_count=5, verbose=False, news_emb=None):
+def encode_context(tokenizer, x, clip=5, sample_count=5):
+    """裁剪并按 sample_count 复制历史窗口后编码为 (s1, s2) token，与 auto_regressive_inference 内部一致"""
+    with torch.no_grad(), torch.autocast(device_type=x.device.type, enabled=False):
+        x = torch.clip(x, -clip, clip)
+        x = x.unsqueeze(1).repeat(1, sample_count, 1, 1).reshape(-1, x.size(1), x.size(2))
+        return tokenizer.encode(x, half=True)
+
+
+def auto_regressive_inference(tokenizer, model, x, x_stamp, y_stamp, max_context, pred_len, clip=5, T=1.0, top_k=0, top_p=0.99, sample_count=5, verbose=False, news_emb=None, x_token=None):
     with torch.no_grad():
         x = torch.clip(x, -clip, clip)
 
@@ -412,7 +423,10 @@ def auto_regressive_inference(tokenizer, model, x, x_stamp, y_stamp, max_context
         x_stamp = x_stamp.unsqueeze(1).repeat(1, sample_count, 1, 1).reshape(-1, x_stamp.size(1), x_stamp.size(2)).to(device)
         y_stamp = y_stamp.unsqueeze(1).repeat(1, sample_count, 1, 1).reshape(-1, y_stamp.size(1), y_stamp.size(2)).to(device)
 
-        x_token = tokenizer.encode(x, half=True)
+        if x_token is None:
+            # tokenizer 的二值量化对精度敏感：即使外层开启了 autocast 也保持 FP32 计算
+            with torch.autocast(device_type=device.type, enabled=False):
+                x_token = tokenizer.encode(x, half=True)
         
         initial_seq_len = x.size(1)
         batch_size = x_token[0].size(0)
@@ -478,7 +492,8 @@ def auto_regressive_inference(tokenizer, model, x, x_stamp, y_stamp, max_context
             full_pre[:, context_start:total_seq_len].contiguous(),
             full_post[:, context_start:total_seq_len].contiguous()
         ]
-        z = tokenizer.decode(input_tokens, half=True)
+        with torch.autocast(device_type=device.type, enabled=False):
+            z = tokenizer.decode(input_tokens, half=True)
         z = z.reshape(-1, sample_count, z.size(1), z.size(2))
         preds = z.cpu().numpy()
         preds = np.mean(preds, axis=1)
@@ -511,15 +526,33 @@ class KronosPredictor:
 
         self.tokenizer = self.tokenizer.to(self.device)
         self.model = self.model.to(self.device)
+        # 历史窗口 token 缓存：同一窗口的重复预测（如有/无新闻两次预测）免去 tokenizer 编码
+        self._token_cache = OrderedDict()
+        self._token_cache_size = 16
+
+    def _encode_cached(self, x, x_tensor, sample_count):
+        """按归一化后的窗口内容缓存编码结果；窗口平移会改变归一化，因此只复用完全相同的窗口"""
+        key = (hashlib.blake2b(x.tobytes(), digest_size=16).digest(), x.shape, self.clip, sample_count)
+        tokens = self._token_cache.get(key)
+        if tokens is None:
+            tokens = encode_context(self.tokenizer, x_tensor, self.clip, sample_count)
+            self._token_cache[key] = tokens
+            if len(self._token_cache) > self._token_cache_size:
+                self._token_cache.popitem(last=False)
+        else:
+            self._token_cache.move_to_end(key)
+        return tokens
 
     def generate(self, x, x_stamp, y_stamp, pred_len, T, top_k, top_p, sample_count, verbose, news_emb=None):
 
-        x_tensor = torch.from_numpy(np.array(x).astype(np.float32)).to(self.device)
+        x = np.ascontiguousarray(x, dtype=np.float32)
+        x_tensor = torch.from_numpy(x).to(self.device)
         x_stamp_tensor = torch.from_numpy(np.array(x_stamp).astype(np.float32)).to(self.device)
         y_stamp_tensor = torch.from_numpy(np.array(y_stamp).astype(np.float32)).to(self.device)
+        x_token = self._encode_cached(x, x_tensor, sample_count)
 
         preds = auto_regressive_inference(self.tokenizer, self.model, x_tensor, x_stamp_tensor, y_stamp_tensor, self.max_context, pred_len,
-                                          self.clip, T, top_k, top_p, sample_count, verbose, news_emb=news_emb)
+                                          self.clip, T, top_k, top_p, sample_count, verbose, news_emb=news_emb, x_token=x_token)
         preds = preds[:, -pred_len:, :]
         return preds
 
@@ -1,24 +1,51 @@
 import os
 import hashlib
-import json
 import re
+from difflib import SequenceMatcher
 import requests
+from requests.adapters import HTTPAdapter
 import time
 import threading
-from typing import List, Dict, Optional, Any
+from concurrent.futures import ThreadPoolExecutor
+from collections import OrderedDict
+from typing import List, Dict, Optional, Any, Tuple
 from agno.tools.duckduckgo import DuckDuckGoTools
 from agno.tools.baidusearch import BaiduSearchTools
 from agno.agent import Agent
 from loguru import logger
-from datetime import datetime
+from datetime import datetime, timedelta
 from utils.database_manager import DatabaseManager
 from utils.content_extractor import ContentExtractor
+from utils.sentiment_tools import SentimentTools
+from utils.json_utils import _loads, _matching_bracket_end
 from utils.llm.factory import get_model
 from utils.hybrid_search import LocalNewsSearch
 
 # 默认搜索缓存 TTL（秒），可通过环境变量覆盖
 DEFAULT_SEARCH_TTL = int(os.getenv("SEARCH_CACHE_TTL", "3600"))  # 默认 1 小时
 
+# 智能缓存候选的最低字面相似度：低于该值的历史查询不交给 LLM 评估
+SMART_CACHE_MIN_SIMILARITY = 0.35
+
+_JSON_FENCE_RE = re.compile(r'```json\s*(.*?)\s*```', re.DOTALL)
+
+
+def _extract_json_obj(content: str) -> Optional[Any]:
+    """
+    从 LLM 回复中取出 JSON 对象：优先 ```json 代码块，否则取第一个 { 开始的完整括号段
+    
+    括号配对扫描会跳过字符串字面量；没有 { 时返回 None，JSON 非法时抛出 ValueError。
+    """
+    match = _JSON_FENCE_RE.search(content)
+    if match:
+        return _loads(match.group(1))
+    start = content.find('{')
+    if start == -1:
+        return None
+    end = _matching_bracket_end(content, start)
+    # 括号未闭合时沿用旧行为：截到最后一个 }
+    return _loads(content[start:end if end is not None else content.rfind('}') + 1])
+
 
 class JinaSearchEngine:
     """Jina Search API 封装 - 使用 s.jina.ai 进行网络搜索"""
@@ -33,6 +60,10 @@ class JinaSearchEngine:
     _last_request_time = 0.0
     _lock = threading.Lock()
     
+    # 共享连接池会话：连续搜索复用到 s.jina.ai 的 TCP/TLS 连接
+    _session = requests.Session()
+    _session.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=16))
+    
     def __init__(self):
         self.api_key = os.getenv("JINA_API_KEY", "").strip()
         self.has_api_key = bool(self.api_key)
@@ -99,7 +130,7 @@ class JinaSearchEngine:
             encoded_query = urllib.parse.quote(query)
             url = f"{self.JINA_SEARCH_URL}{encoded_query}"
             
-            response = requests.get(url, headers=headers, timeout=30)
+            response = self._session.get(url, headers=headers, timeout=30)
             
             if response.status_code == 429:
                 logger.warning("⚠️ Jina Search rate limited (429), waiting 30s...")
@@ -112,8 +143,8 @@ class JinaSearchEngine:
             
             # 解析响应
             try:
-                data = response.json()
-            except json.JSONDecodeError:
+                data = _loads(response.content)
+            except ValueError:
                 # 如果返回纯文本，尝试解析
                 data = {"data": [{"title": "Search Result", "url": "", "content": response.text}]}
             
@@ -156,6 +187,10 @@ class JinaSearchEngine:
 class SearchTools:
     """扩展性搜索工具库 - 支持多引擎聚合与内容缓存"""
     
+    # 进程内短期缓存挡在 SQLite 之前，吸收 Agent 短时间内的重复查询：最长 60 秒，最多 512 条
+    _MEM_CACHE_TTL = 60
+    _MEM_CACHE_MAXSIZE = 512
+    
     def __init__(self, db: DatabaseManager):
         self.db = db
         
@@ -176,9 +211,46 @@ class SearchTools:
         
         # 确定默认搜索引擎
         self._default_engine = "jina" if self._jina_enabled else "ddg"
+        
+        # 正文抽取器在实例间复用；情绪分析工具（加载 BERT 较慢）在首次 enrichment 时才加载
+        self.extractor = ContentExtractor()
+        self._sentiment_tool = None
+        self._sentiment_lock = threading.Lock()
+        # 智能缓存评估模型在首次评估时才构建
+        self._eval_model = None
+        self._eval_lock = threading.Lock()
+        # (kind, query_hash) -> (写入时刻, 结果)；search 与 search_list 的结果形态不同，按 kind 区分
+        self._mem_cache: "OrderedDict[Tuple[str, str], Tuple[float, Any]]" = OrderedDict()
+        self._mem_lock = threading.Lock()
+
+    def _mem_get(self, key: Tuple[str, str], effective_ttl: int) -> Optional[Any]:
+        """读取进程内缓存；有效期取 _MEM_CACHE_TTL 与调用方 TTL 的较小者，ttl=0（强制刷新）时不命中"""
+        if effective_ttl == 0:
+            return None
+        ttl = min(effective_ttl, self._MEM_CACHE_TTL) if effective_ttl > 0 else self._MEM_CACHE_TTL
+        with self._mem_lock:
+            entry = self._mem_cache.get(key)
+            if entry is None or time.monotonic() - entry[0] > ttl:
+                return None
+            self._mem_cache.move_to_end(key)
+            return entry[1]
+
+    def _mem_put(self, key: Tuple[str, str], value: Any) -> None:
+        with self._mem_lock:
+            self._mem_cache[key] = (time.monotonic(), value)
+            self._mem_cache.move_to_end(key)
+            while len(self._mem_cache) > self._MEM_CACHE_MAXSIZE:
+                self._mem_cache.popitem(last=False)
+
+    @staticmethod
+    def _copy_results(results: List[Dict]) -> List[Dict]:
+        """返回结果列表及各条目的浅拷贝，调用方的修改不会影响进程内缓存中的同一份数据"""
+        return [dict(item) for item in results]
 
-    def _generate_hash(self, query: str, engine: str, max_results: int) -> str:
-        return hashlib.md5(f"{engine}:{query}:{max_results}".encode()).hexdigest()
+    @staticmethod
+    def _generate_hash(query: str, engine: str, max_results: int) -> str:
+        # 仅作本地缓存键：BLAKE2b-128 比 MD5 更快，输出同为 32 位十六进制（旧 MD5 键自然失效后按新键重写）
+        return hashlib.blake2b(f"{engine}:{query}:{max_results}".encode(), digest_size=16).hexdigest()
 
     def search(self, query: str, engine: str = None, max_results: int = 5, ttl: Optional[int] = None) -> str:
         """
@@ -212,9 +284,15 @@ class SearchTools:
         
         # 1. 尝试从缓存读取 (local 引擎不缓存，因为它本身就是查库)
         if engine != "local":
+            mem_key = ("search", query_hash)
+            cached_results = self._mem_get(mem_key, effective_ttl)
+            if cached_results is not None:
+                logger.info(f"⚡ Found search results in memory cache for: {query} ({engine})")
+                return cached_results
             cache = self.db.get_search_cache(query_hash, ttl_seconds=effective_ttl if effective_ttl > 0 else None)
             if cache and effective_ttl != 0:
                 logger.info(f"ℹ️ Found search results in cache for: {query} ({engine})")
+                self._mem_put(mem_key, cache['results'])
                 return cache['results']
 
         # 2. 执行真实搜索
@@ -251,6 +329,7 @@ class SearchTools:
             results_str = str(results)
             if engine != "local":
                 self.db.save_search_cache(query_hash, query, engine, results_str)
+                self._mem_put(mem_key, results_str)
             return results_str
             
         except Exception as e:
@@ -293,14 +372,20 @@ class SearchTools:
         query_hash = self._generate_hash(query, engine + enrich_suffix, max_results)
         effective_ttl = ttl if ttl is not None else DEFAULT_SEARCH_TTL
         
-        # 1. 尝试从缓存读取
+        # 1. 尝试从缓存读取：进程内缓存保存已解析的列表，命中时免去 SQLite 读取与 JSON 解析
+        mem_key = ("list", query_hash)
+        cached_data = self._mem_get(mem_key, effective_ttl)
+        if cached_data is not None:
+            logger.info(f"⚡ Found structured search results in memory cache for: {query}")
+            return self._copy_results(cached_data)
         cache = self.db.get_search_cache(query_hash, ttl_seconds=effective_ttl if effective_ttl > 0 else None)
         if cache and effective_ttl != 0:
             try:
-                cached_data = json.loads(cache['results'])
+                cached_data = _loads(cache['results'])
                 if isinstance(cached_data, list):
                     logger.info(f"ℹ️ Found structured search cache for: {query}")
-                    return cached_data
+                    self._mem_put(mem_key, cached_data)
+                    return self._copy_results(cached_data)
             except:
                 pass
         
@@ -308,13 +393,14 @@ class SearchTools:
         if effective_ttl != 0:
             try:
                 # 1. Similar cached queries
-                similar_queries = self.db.find_similar_queries(query, limit=3)
-                # Filter by TTL
+                # TTL 过滤下推到 SQL：按截止时刻的 ISO 串比较，无需逐条解析时间
+                since = (datetime.now() - timedelta(seconds=effective_ttl)).isoformat() if effective_ttl else None
+                similar_queries = self.db.find_similar_queries(query, limit=3, since=since)
                 valid_candidates = []
                 for q in similar_queries:
                     if q['query'] == query: continue 
-                    q_time = datetime.fromisoformat(q['timestamp'])
-                    if effective_ttl and (datetime.now() - q_time).total_seconds() > effective_ttl:
+                    # 字面相似度过低的候选几乎不会被采纳，提前丢弃以免白付一次 LLM 调用
+                    if SequenceMatcher(None, query, q['query']).quick_ratio() < SMART_CACHE_MIN_SIMILARITY:
                         continue
                     q['type'] = 'cached_search'
                     valid_candidates.append(q)
@@ -348,7 +434,7 @@ class SearchTools:
                                 cache = self.db.get_search_cache(chosen['query_hash']) 
                                 if cache:
                                     try:
-                                        cached_data = json.loads(cache['results'])
+                                        cached_data = _loads(cache['results'])
                                         if isinstance(cached_data, list):
                                             return cached_data
                                     except:
@@ -412,7 +498,7 @@ class SearchTools:
             # 处理字符串类型的 JSON 返回 (Baidu 常返 JSON 字符串)
             if isinstance(results, str) and engine not in ["local", "jina"]:
                 try:
-                    results = json.loads(results)
+                    results = _loads(results)
                 except:
                     pass
             
@@ -449,57 +535,28 @@ class SearchTools:
             
             if enrich and normalized_results:
                 logger.info(f"🕸️ Enriching {len(normalized_results)} search results with Jina & Sentiment...")
-                extractor = ContentExtractor()
+                to_enrich = [item for item in normalized_results if item.get("url")]
                 
-                # Lazy load sentiment tool
-                if not hasattr(self, 'sentiment_tool') or self.sentiment_tool is None:
-                    from utils.sentiment_tools import SentimentTools
-                    self.sentiment_tool = SentimentTools(self.db)
-                
-                for item in normalized_results:
-                    if item.get("url"):
-                        try:
-                            # 如果是 Jina Search，内容已经足够好，跳过额外抓取
-                            if skip_content_enrichment and item.get("content") and len(item.get("content", "")) > 100:
-                                full_content = item["content"]
-                            else:
-                                # Use Jina Reader to get full content
-                                full_content = extractor.extract_with_jina(item["url"], timeout=60)
-                            
-                            if full_content and len(full_content) > 100:
-                                item["content"] = full_content
-                                
-                                # Calculate sentiment
-                                # Use title + snippet of content for efficiency
-                                text_to_analyze = f"{item['title']} {full_content[:500]}"
-                                sent_result = self.sentiment_tool.analyze_sentiment(text_to_analyze)  # Using self.sentiment_tool
-                                score = sent_result.get('score', 0.0)
-                                item["sentiment_score"] = float(score)
-                                
-                                logger.info(f"  ✅ Enriched: {item['title'][:20]}... (Sentiment: {score:.2f})")
-                            else:
-                                # Fallback: Use snippet for sentiment
-                                logger.info(f"  ⚠️ Content short/failed for {item['url']}, using snippet for sentiment.")
-                                text_to_analyze = f"{item['title']} {item['content']}" # content is snippet here
-                                sent_result = self.sentiment_tool.analyze_sentiment(text_to_analyze)
-                                score = sent_result.get('score', 0.0)
-                                item["sentiment_score"] = float(score)
-
-                        except Exception as e:
-                             # Fallback: Use snippet for sentiment on error
-                            logger.warning(f"Failed to enrich {item['url']}: {e}. Using snippet.")
-                            text_to_analyze = f"{item['title']} {item['content']}"
-                            sent_result = self.sentiment_tool.analyze_sentiment(text_to_analyze)
-                            score = sent_result.get('score', 0.0)
-                            item["sentiment_score"] = float(score)
+                if to_enrich:
+                    # 正文抓取是网络等待，线程并发；各条结果再合并为一次批量情绪分析
+                    with ThreadPoolExecutor(max_workers=min(len(to_enrich), 8)) as executor:
+                        texts = list(executor.map(
+                            lambda item: self._enrich_content(item, skip_content_enrichment), to_enrich
+                        ))
+                    
+                    for item, sent_result in zip(to_enrich, self._get_sentiment_tool().analyze_sentiment_batch(texts)):
+                        score = sent_result.get('score', 0.0)
+                        item["sentiment_score"] = float(score)
+                        logger.info(f"  ✅ Enriched: {item['title'][:20]}... (Sentiment: {score:.2f})")
             
             # 缓存结果 list
             if normalized_results:
                 # Pass list directly, DB manager will handle JSON dump for main cache and populate search_details
                 # Only cache if NOT from local news reuse (though this logic path is for fresh search)
                 self.db.save_search_cache(query_hash, query, engine, normalized_results)
+                self._mem_put(mem_key, normalized_results)
             
-            return normalized_results
+            return self._copy_results(normalized_results)
             
         except Exception as e:
             # 搜索失败时的降级策略
@@ -519,6 +576,52 @@ class SearchTools:
             logger.error(f"❌ Structured search failed for {query}: {e}")
             return []
 
+    def _get_sentiment_tool(self):
+        """延迟初始化情绪分析工具（加载 BERT 较慢），加锁避免并发调用重复加载"""
+        if self._sentiment_tool is None:
+            with self._sentiment_lock:
+                if self._sentiment_tool is None:
+                    self._sentiment_tool = SentimentTools(self.db)
+        return self._sentiment_tool
+
+    def _enrich_content(self, item: Dict, skip_content_enrichment: bool) -> str:
+        """
+        用 Jina Reader 抓取单条结果的正文（原地写回 item["content"]），返回用于情绪分析的文本
+        
+        正文过短或抓取失败时回退为标题 + 摘要。
+        """
+        try:
+            # 如果是 Jina Search，内容已经足够好，跳过额外抓取
+            if skip_content_enrichment and item.get("content") and len(item.get("content", "")) > 100:
+                full_content = item["content"]
+            else:
+                # Use Jina Reader to get full content
+                full_content = self.extractor.extract_with_jina(item["url"], timeout=60)
+            
+            if full_content and len(full_content) > 100:
+                item["content"] = full_content
+                # Use title + snippet of content for efficiency
+                return f"{item['title']} {full_content[:500]}"
+            logger.info(f"  ⚠️ Content short/failed for {item['url']}, using snippet for sentiment.")
+        except Exception as e:
+            logger.warning(f"Failed to enrich {item['url']}: {e}. Using snippet.")
+        # Fallback: Use snippet for sentiment
+        return f"{item['title']} {item['content']}"
+
+    def _get_eval_model(self):
+        """智能缓存评估所用模型，首次调用时按环境变量构建并缓存"""
+        if self._eval_model is None:
+            with self._eval_lock:
+                if self._eval_model is None:
+                    provider = os.getenv("LLM_PROVIDER", "ust")
+                    model_id = os.getenv("LLM_MODEL", "Qwen")
+                    host = os.getenv("LLM_HOST")
+                    if host:
+                        self._eval_model = get_model(provider, model_id, host=host)
+                    else:
+                        self._eval_model = get_model(provider, model_id)
+        return self._eval_model
+
     def _evaluate_cache_relevance(self, current_query: str, candidates: List[Dict]) -> Dict:
         """
         使用 LLM 评估缓存候选是否足以回答当前问题。
@@ -535,7 +638,7 @@ class SearchTools:
                     try:
                          # Attempt to peek first result title from JSON string
                          # Note: c.get('results') might be a stringified JSON list
-                         res_list = json.loads(c.get('results', '[]'))
+                         res_list = _loads(c.get('results', '[]'))
                          if res_list and isinstance(res_list, list) and len(res_list) > 0:
                              first_item = res_list[0]
                              if isinstance(first_item, dict) and 'title' in first_item:
@@ -562,28 +665,14 @@ class SearchTools:
             3. If the query implies needing LATEST real-time info and candidates are old, choose none.
             4. Return strictly JSON: {{"reuse": true/false, "index": <candidate_index_int>, "reason": "short explanation"}}
             """
-            # 初始化模型
-            provider = os.getenv("LLM_PROVIDER", "ust")
-            model_id = os.getenv("LLM_MODEL", "Qwen")
-            host = os.getenv("LLM_HOST")
-            if host:
-                model = get_model(provider, model_id, host=host)
-            else:
-                model = get_model(provider, model_id)
-                
-            agent = Agent(model=model, markdown=True)
+            # Agent 本身很轻，每次新建以免并发评估共享运行状态；模型（含 HTTP 客户端）复用
+            agent = Agent(model=self._get_eval_model(), markdown=True)
             
             response = agent.run(prompt)
             content = response.content
             
             # Parse JSON
-            json_match = re.search(r'```json\s*(.*?)\s*```', content, re.DOTALL)
-            if json_match:
-                return json.loads(json_match.group(1))
-            elif '{' in content:
-                 # Fallback for cases where LLM doesn't wrap in ```json
-                 return json.loads(content[content.find('{'):content.rfind('}')+1])
-            return {"reuse": False}
+            return _extract_json_obj(content) or {"reuse": False}
             
         except Exception as e:
             logger.warning(f"LLM evaluation failed: {e}")
@@ -603,9 +692,9 @@ class SearchTools:
             聚合后的搜索结果，按引擎分组显示。
         """
         engines = engines or ["ddg", "baidu"]
-        aggregated_results = []
-        for engine in engines:
-            res = self.search(query, engine=engine, max_results=max_results)
-            aggregated_results.append(f"--- Results from {engine.upper()} ---\n{res}")
+        # 各引擎请求互不依赖，并发执行：总耗时由各引擎之和降为最慢的一个；map 保持引擎顺序
+        with ThreadPoolExecutor(max_workers=len(engines)) as executor:
+            results = executor.map(lambda engine: self.search(query, engine=engine, max_results=max_results), engines)
+            aggregated_results = [f"--- Results from {engine.upper()} ---\n{res}" for engine, res in zip(engines, results)]
         
         return "\n\n".join(aggregated_results)
@@ -1,6 +1,7 @@
 import os
 from typing import Dict, List, Union, Optional
 import json
+from concurrent.futures import ThreadPoolExecutor
 from loguru import logger
 from agno.agent import Agent
 from utils.llm.factory import get_model
@@ -112,6 +113,20 @@ class SentimentTools:
             results = self.analyze_sentiment_bert([text])
             return results[0] if results else {"score": 0.0, "label": "error"}
 
+    def analyze_sentiment_batch(self, texts: List[str]) -> List[Dict[str, Union[float, str]]]:
+        """
+        批量分析多段文本的情绪，结果与输入一一对应。
+        
+        BERT 模式下整批送入一次 pipeline 调用；LLM 模式下各请求并发发出。
+        """
+        if not texts:
+            return []
+        # 与 analyze_sentiment 的模式选择保持一致
+        if self.mode == "llm" or (self.mode == "auto" and not self.bert_pipeline):
+            with ThreadPoolExecutor(max_workers=min(len(texts), 8)) as executor:
+                return list(executor.map(self.analyze_sentiment_llm, texts))
+        return self.analyze_sentiment_bert(texts)
+
     def analyze_sentiment_llm(self, text: str) -> Dict[str, Union[float, str]]:
         """
         使用 LLM 进行深度情绪分析，可获得详细的分析理由。
@@ -201,31 +216,21 @@ class SentimentTools:
         # 决定使用哪种方法
         should_use_bert = use_bert if use_bert is not None else (self.bert_pipeline is not None and self.mode != "llm")
 
-        updated_count = 0
-        cursor = self.db.conn.cursor()
-        
+        # 先算出全部结果再单事务写回，避免逐条调用 LLM 期间在共享连接上挂着未提交的更新
         if should_use_bert and self.bert_pipeline:
             logger.info(f"🚀 Using BERT for batch analysis of {len(to_analyze)} items...")
             titles = [item['title'] for item in to_analyze]
             results = self.analyze_sentiment_bert(titles)
-            
-            for item, analysis in zip(to_analyze, results):
-                cursor.execute("""
-                    UPDATE daily_news 
-                    SET sentiment_score = ?, meta_data = json_set(COALESCE(meta_data, '{}'), '$.sentiment_reason', ?)
-                    WHERE id = ?
-                """, (analysis['score'], analysis['reason'], item['id']))
-                updated_count += 1
+            rows = [
+                (analysis['score'], analysis['reason'], item['id'])
+                for item, analysis in zip(to_analyze, results)
+            ]
         else:
             logger.info(f"🚶 Using LLM for analysis of {len(to_analyze)} items...")
+            rows = []
             for item in to_analyze:
                 analysis = self.analyze_sentiment_llm(item['title'])
-                cursor.execute("""
-                    UPDATE daily_news 
-                    SET sentiment_score = ?, meta_data = json_set(COALESCE(meta_data, '{}'), '$.sentiment_reason', ?)
-                    WHERE id = ?
-                """, (analysis.get('score', 0.0), analysis.get('reason', ''), item['id']))
-                updated_count += 1
+                rows.append((analysis.get('score', 0.0), analysis.get('reason', ''), item['id']))
         
-        self.db.conn.commit()
-        return updated_count
+        self.db.update_news_sentiments(rows)
+        return len(rows)
@@ -26,9 +26,7 @@ class StockTools:
     def _check_and_update_stock_list(self, force: bool = False):
         """检查并更新股票列表。仅在列表为空或 force=True 时从网络拉取。"""
         # 直接查询表中记录数
-        cursor = self.db.conn.cursor()
-        cursor.execute("SELECT COUNT(*) FROM stock_list")
-        count = cursor.fetchone()[0]
+        count = self.db.count_stock_list()
         
         if count > 0 and not force:
             logger.info(f"ℹ️ Stock list already cached ({count} stocks)")
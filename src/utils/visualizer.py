@@ -1,11 +1,75 @@
+import hashlib
 import os
-from typing import Dict, List, Any, Optional
+from functools import lru_cache
+from typing import TYPE_CHECKING, Dict, List, Any, Optional, Tuple
+import numpy as np
 import pandas as pd
 from loguru import logger
-from pyecharts.charts import Kline, Line, Bar, Grid, Radar, Graph
-from pyecharts import options as opts
-from pyecharts.globals import ThemeType
-from datetime import datetime, timedelta
+
+# pyecharts 的包初始化会加载全部图表类型，因此在各图表方法内按需导入：
+# 仅导入本模块（如只用 render_drawio_to_html）时不付出这部分开销，后续调用只是一次 sys.modules 查找
+if TYPE_CHECKING:
+    from pyecharts.charts import Graph, Grid, Line, Radar
+
+# 预测区间之外的 K 线占位（只读元组，可在多条序列间共享同一对象）
+_EMPTY_CANDLE = (None, None, None, None)
+
+# 已写出文件的内容指纹：文件名 -> 图表配置摘要，内容未变时跳过重复渲染
+_RENDER_CACHE: Dict[str, str] = {}
+
+# 长历史降采样为周 K 时各列的聚合方式
+_WEEKLY_OHLCV = {'open': 'first', 'high': 'max', 'low': 'min', 'close': 'last', 'volume': 'sum'}
+
+
+@lru_cache(maxsize=None)
+def _isq_radar_schema() -> tuple:
+    """ISQ 雷达图的五个维度与输入无关，首次绘图时构建一次（add_schema 只读取、不修改）"""
+    from pyecharts import options as opts
+
+    return tuple(
+        opts.RadarIndicatorItem(name=name, max_=100)
+        for name in ("情绪强度", "确定性", "影响力", "预期差", "时效性")
+    )
+
+
+@lru_cache(maxsize=None)
+def _init_opts(height: str) -> Any:
+    """各图表共用的浅色主题 InitOpts，按高度缓存（pyecharts 构造图表时只读取、不修改）"""
+    from pyecharts import options as opts
+    from pyecharts.globals import ThemeType
+
+    return opts.InitOpts(width="100%", height=height, theme=ThemeType.LIGHT)
+
+
+def _isq_normalize(sentiment: float, confidence: float, intensity: int,
+                   expectation_gap: float, timeliness: float) -> List[float]:
+    """
+    将 ISQ 各维度标准化到 0-100，顺序与 _isq_radar_schema() 一致
+    
+    仅五次标量运算，numba 的调用分派开销反而高于解释执行，因此保持纯 Python。
+    """
+    return [
+        min(100, abs(sentiment) * 100),  # sentiment 强度: 绝对值越大强度越高
+        confidence * 100,                # confidence: 0 to 1 -> 0 to 100
+        intensity * 20,                  # intensity: 1 to 5 -> 20 to 100
+        expectation_gap * 100,           # gap & time: 0 to 1 -> 0 to 100
+        timeliness * 100,
+    ]
+
+
+def _points_to_klist(points: List[Any]) -> List[List[float]]:
+    """将 KLinePoint 序列转换为 pyecharts 的 [open, close, low, high] 行：一次 fromiter 填充 (N, 4) 数组后整体 tolist"""
+    return np.fromiter(
+        ((p.open, p.close, p.low, p.high) for p in points),
+        dtype=np.dtype((np.float64, 4)),
+        count=len(points),
+    ).tolist()
+
+
+@lru_cache(maxsize=512)
+def _wrap_text(text: str, width: int = 6) -> str:
+    """按固定宽度为节点名插入换行；同名节点在多次绘图间复用结果"""
+    return '\n'.join(text[i:i + width] for i in range(0, len(text), width))
 
 class VisualizerTools:
     """可视化工具库 - 使用 Pyecharts 生成 HTML 图表"""
@@ -17,19 +81,37 @@ class VisualizerTools:
         title: str = None,
         prediction: Optional[List[float]] = None,
         forecast: Optional[Any] = None, # ForecastResult instance
-        ground_truth: Optional[pd.DataFrame] = None # For training visualization
-    ) -> Grid:
+        ground_truth: Optional[pd.DataFrame] = None, # For training visualization
+        max_candles: int = 800
+    ) -> "Grid":
         """
         生成股票 K 线图 + 成交量 + 预测趋势 (支持多状态 K 线)
+        
+        历史超过 max_candles 根时按周聚合，控制嵌入 HTML 的数据量与浏览器端绘制开销。
         """
+        from pyecharts.charts import Bar, Grid, Kline, Line
+        from pyecharts import options as opts
+
         if df.empty:
             return None
 
         # 数据预处理
         df = df.sort_values('date')
-        dates = [str(d)[:10] for d in df['date'].tolist()]
-        k_data = df[['open', 'close', 'low', 'high']].values.tolist()
-        volumes = df['volume'].tolist()
+        if max_candles and len(df) > max_candles:
+            df = (
+                df.assign(date=pd.to_datetime(df['date']))
+                .set_index('date')
+                .resample('W')
+                .agg(_WEEKLY_OHLCV)
+                .dropna(subset=['open'])
+                .reset_index()
+            )
+        dates = pd.to_datetime(df['date'], errors='coerce').dt.strftime('%Y-%m-%d').tolist()
+        # 逐列取出连续的 float64 数组后一次性 tolist，避免 DataFrame.values 走 object 路径逐行装箱
+        k_data = np.column_stack(
+            [df[col].to_numpy(dtype=np.float64) for col in ('open', 'close', 'low', 'high')]
+        ).tolist()
+        volumes = df['volume'].to_numpy().tolist()
         
         if not title:
             title = f"{ticker} 股价走势与预测"
@@ -40,20 +122,21 @@ class VisualizerTools:
         pred_line = None
         if prediction and not forecast:
             try:
-                last_date_str = dates[-1]
-                last_date = datetime.strptime(last_date_str, "%Y-%m-%d")
-                
-                pred_dates = []
-                for i in range(1, len(prediction) + 1):
-                    pred_dates.append((last_date + timedelta(days=i)).strftime("%Y-%m-%d"))
+                last_date = pd.to_datetime(dates[-1])
+                pred_dates = pd.date_range(
+                    last_date + pd.Timedelta(days=1), periods=len(prediction), freq='D'
+                ).strftime("%Y-%m-%d").tolist()
                 
-                ext_dates = dates + pred_dates
-                last_close = df.iloc[-1]['close']
-                pred_values = [None] * (len(df) - 1) + [float(last_close)] + prediction
+                # 预分配整条序列后按槽位写入：历史段为 None，最后一根收盘价作为预测线起点
+                n = len(df)
+                pred_values = [None] * (n + len(prediction))
+                pred_values[n - 1] = float(df['close'].iat[-1])
+                pred_values[n:] = prediction
+                dates.extend(pred_dates)
                 
                 pred_line = (
                     Line()
-                    .add_xaxis(ext_dates)
+                    .add_xaxis(dates)
                     .add_yaxis(
                         "AI预测趋势",
                         pred_values,
@@ -63,7 +146,6 @@ class VisualizerTools:
                         label_opts=opts.LabelOpts(is_show=False)
                     )
                 )
-                dates = ext_dates
                 legend_items.append("AI预测趋势")
             except Exception as e:
                 logger.error(f"Failed to process simple prediction: {e}")
@@ -79,16 +161,20 @@ class VisualizerTools:
                 adj_points = forecast.adjusted_forecast # List[KLinePoint]
                 
                 # 提取日期
-                pred_dates = [str(p.date)[:10] for p in (adj_points or base_points)]
+                pred_dates = pd.to_datetime(
+                    [p.date for p in (adj_points or base_points)], errors='coerce'
+                ).strftime('%Y-%m-%d').tolist()
                 
                 # 检查日期是否已经包含在主 dates 中，如果没有则扩展
                 if pred_dates and pred_dates[0] not in dates:
-                    dates = dates + pred_dates
+                    dates.extend(pred_dates)
+                
+                # 历史区间的占位前缀只构建一次，供 Baseline / Adjusted 两条序列共用
+                none_prefix = [_EMPTY_CANDLE] * len(df)
                 
                 # 构建 Baseline 预测 K 线数据
                 if base_points:
-                    # 前面填充 None
-                    base_k_data = [[None]*4] * len(df) + [[p.open, p.close, p.low, p.high] for p in base_points]
+                    base_k_data = none_prefix + _points_to_klist(base_points)
                     base_kline = (
                         Kline()
                         .add_xaxis(dates)
@@ -109,7 +195,7 @@ class VisualizerTools:
 
                 # 构建 Adjusted 调优 K 线数据
                 if adj_points:
-                    adj_k_data = [[None]*4] * len(df) + [[p.open, p.close, p.low, p.high] for p in adj_points]
+                    adj_k_data = none_prefix + _points_to_klist(adj_points)
                     adj_kline = (
                         Kline()
                         .add_xaxis(dates)
@@ -164,8 +250,12 @@ class VisualizerTools:
                 logger.error(f"Failed to process ground truth: {e}")
 
         # 3. 主 K 线图
-        # 为了展示预测，也需要对主 K 线数据进行填充
-        main_k_data = k_data + [[None]*4] * (len(dates) - len(df))
+        # 为了展示预测，也需要对主 K 线与成交量数据进行填充（均为本函数内新建的列表，原地扩展）
+        # 无预测 / 真实走势时（实时看板的常见情况）x 轴未扩展，直接使用原列表
+        tail_pad = len(dates) - len(df)
+        main_k_data = k_data
+        if tail_pad:
+            main_k_data.extend([_EMPTY_CANDLE] * tail_pad)
         
         kline = (
             Kline()
@@ -196,14 +286,14 @@ class VisualizerTools:
         )
         
         # Overlap all series
-        if pred_line: kline.overlap(pred_line)
-        if base_kline: kline.overlap(base_kline)
-        if adj_kline: kline.overlap(adj_kline)
-        if gt_line: kline.overlap(gt_line)
+        for overlay in (pred_line, base_kline, adj_kline, gt_line):
+            if overlay:
+                kline.overlap(overlay)
 
         # 4. 成交量柱状图
-        # 同理扩展成交量数据
-        ext_volumes = volumes + [0] * (len(dates) - len(df))
+        ext_volumes = volumes
+        if tail_pad:
+            ext_volumes.extend([0] * tail_pad)
         
         bar = (
             Bar()
@@ -227,7 +317,7 @@ class VisualizerTools:
         )
 
         # 5. 组合 Grid
-        grid_chart = Grid(init_opts=opts.InitOpts(width="100%", height="450px", theme=ThemeType.LIGHT))
+        grid_chart = Grid(init_opts=_init_opts("450px"))
         grid_chart.add(
             kline,
             grid_opts=opts.GridOpts(pos_left="10%", pos_right="8%", height="50%"),
@@ -242,10 +332,13 @@ class VisualizerTools:
         return grid_chart
 
     @staticmethod
-    def generate_loss_chart(losses: List[float], title: str = "训练损失收敛曲线") -> Line:
+    def generate_loss_chart(losses: List[float], title: str = "训练损失收敛曲线") -> "Line":
         """生成 Loss 下降曲线图"""
+        from pyecharts.charts import Line
+        from pyecharts import options as opts
+
         line = (
-            Line(init_opts=opts.InitOpts(width="100%", height="400px", theme=ThemeType.LIGHT))
+            Line(init_opts=_init_opts("400px"))
             .add_xaxis(list(range(1, len(losses) + 1)))
             .add_yaxis(
                 "Training Loss",
@@ -265,16 +358,19 @@ class VisualizerTools:
         return line
 
     @staticmethod
-    def generate_sentiment_trend_chart(sentiment_history: List[Dict[str, Any]]) -> Line:
+    def generate_sentiment_trend_chart(sentiment_history: List[Dict[str, Any]]) -> "Line":
         """
         生成舆情情绪趋势图
         :param sentiment_history: [{"date": "2024-01-01", "score": 0.8}, ...]
         """
+        from pyecharts.charts import Line
+        from pyecharts import options as opts
+
         dates = [item['date'] for item in sentiment_history]
         scores = [item['score'] for item in sentiment_history]
 
         line = (
-            Line(init_opts=opts.InitOpts(width="100%", height="300px", theme=ThemeType.LIGHT))
+            Line(init_opts=_init_opts("300px"))
             .add_xaxis(dates)
             .add_yaxis(
                 "情绪指数",
@@ -296,33 +392,17 @@ class VisualizerTools:
     @staticmethod
     def generate_isq_radar_chart(sentiment: float, confidence: float, intensity: int, 
                                expectation_gap: float = 0.5, timeliness: float = 0.8,
-                               title: str = "信号质量 ISQ 评估") -> Radar:
+                               title: str = "信号质量 ISQ 评估") -> "Radar":
         """生成信号质量雷达图"""
-        # 标准化数据 (0-100)
-        # sentiment 强度: 绝对值越大强度越高
-        sent_val = min(100, abs(sentiment) * 100)
-        # confidence: 0 to 1 -> 0 to 100
-        conf_val = confidence * 100
-        # intensity: 1 to 5 -> 20 to 100
-        int_val = intensity * 20
-        # gap & time: 0 to 1 -> 0 to 100
-        gap_val = expectation_gap * 100
-        time_val = timeliness * 100
-
-        schema = [
-            opts.RadarIndicatorItem(name="情绪强度", max_=100),
-            opts.RadarIndicatorItem(name="确定性", max_=100),
-            opts.RadarIndicatorItem(name="影响力", max_=100),
-            opts.RadarIndicatorItem(name="预期差", max_=100),
-            opts.RadarIndicatorItem(name="时效性", max_=100),
-        ]
+        from pyecharts.charts import Radar
+        from pyecharts import options as opts
 
         radar = (
-            Radar(init_opts=opts.InitOpts(width="100%", height="400px", theme=ThemeType.LIGHT))
-            .add_schema(schema=schema)
+            Radar(init_opts=_init_opts("400px"))
+            .add_schema(schema=_isq_radar_schema())
             .add(
                 "信号特征",
-                [[sent_val, conf_val, int_val, gap_val, time_val]],
+                [_isq_normalize(sentiment, confidence, intensity, expectation_gap, timeliness)],
                 color="#f97316",
                 areastyle_opts=opts.AreaStyleOpts(opacity=0.3, color="#fb923c"),
             )
@@ -334,16 +414,16 @@ class VisualizerTools:
         return radar
 
     @staticmethod
-    def generate_transmission_graph(nodes_data: List[Dict[str, str]], title: str = "投资逻辑传导链条") -> Graph:
+    def generate_transmission_graph(nodes_data: List[Dict[str, str]], title: str = "投资逻辑传导链条") -> "Graph":
         """生成逻辑传导拓扑图 (支持分支结构)"""
+        from pyecharts.charts import Graph
+        from pyecharts import options as opts
+
         nodes = []
         links = []
-        
-        # Helper for text wrapping
-        def wrap_text(text, width=6):
-            return '\n'.join([text[i:i+width] for i in range(0, len(text), width)])
 
         # Map original names to wrapped names to handle links
+        # 同时以换行后的名字作为自身的键，source 直接给出换行名时也能一次字典查找命中
         name_map = {} 
 
         for i, item in enumerate(nodes_data):
@@ -352,9 +432,10 @@ class VisualizerTools:
             if "中性" in item.get("impact_type", ""): color = "#6b7280"
             
             original_name = item.get("node_name", f"节点{i}")
-            wrapped_name = wrap_text(original_name)
+            wrapped_name = _wrap_text(original_name)
             name_map[original_name] = wrapped_name
             name_map[str(item.get("id", ""))] = wrapped_name # Map ID if present
+            name_map.setdefault(wrapped_name, wrapped_name) # 不覆盖同名的原始名 / ID 映射
 
             nodes.append({
                 "name": wrapped_name,
@@ -371,8 +452,6 @@ class VisualizerTools:
                 # Branching logic: Link from specified source
                 # Source needs to be resolved to its (wrapped) name
                 target_source_name = name_map.get(source_key)
-                if not target_source_name and source_key in name_map.values():
-                     target_source_name = source_key # It was already a mapped name?
                 
                 # If we found the source in our map (meaning it appeared before this node)
                 if target_source_name:
@@ -382,7 +461,7 @@ class VisualizerTools:
                 links.append({"source": nodes[i-1]["name"], "target": wrapped_name})
 
         graph = (
-            Graph(init_opts=opts.InitOpts(width="100%", height="400px", theme=ThemeType.LIGHT))
+            Graph(init_opts=_init_opts("400px"))
             .add(
                 "",
                 nodes,
@@ -459,14 +538,69 @@ class VisualizerTools:
             return ""
 
     @staticmethod
-    def render_chart_to_file(chart: Any, filename: str) -> str:
-        """渲染并保存 HTML"""
+    def _chart_digest(chart: Any) -> Optional[str]:
+        """图表配置与页面参数的摘要；不支持 dump_options 的对象（如 Page）返回 None"""
+        dump_options = getattr(chart, "dump_options", None)
+        if dump_options is None:
+            return None
+        page = f"{chart.width}|{chart.height}|{chart.theme}|{chart.page_title}|{chart.renderer}|{chart.js_host}"
+        h = hashlib.blake2b(digest_size=16)
+        h.update(page.encode("utf-8"))
+        h.update(dump_options().encode("utf-8"))
+        return h.hexdigest()
+
+    @staticmethod
+    def _reuse_rendered(filename: str, digest: Optional[str]) -> bool:
+        """同一文件上次写出的图表配置未变且文件仍在时，仅刷新修改时间并返回 True"""
+        if digest is None or _RENDER_CACHE.get(filename) != digest or not os.path.exists(filename):
+            return False
+        os.utime(filename)
+        logger.info(f"⚡ Chart unchanged, reusing {filename}")
+        return True
+
+    @staticmethod
+    def render_chart_to_file(chart: Any, filename: str, force: bool = False) -> str:
+        """
+        渲染并保存 HTML
+        
+        若同一文件上次写出的图表配置未变且文件仍在，仅刷新修改时间，跳过 Jinja 渲染与写盘；
+        force=True 时总是重新渲染。
+        """
         try:
-            # 确保目录存在
-            os.makedirs(os.path.dirname(filename), exist_ok=True)
-            chart.render(filename)
-            logger.info(f"✅ Chart rendered to {filename}")
-            return filename
+            digest = VisualizerTools._chart_digest(chart)
+            if not force and VisualizerTools._reuse_rendered(filename, digest):
+                return filename
         except Exception as e:
             logger.error(f"Failed to render chart: {e}")
             return ""
+        result = _write_chart((chart, filename))
+        if result and digest is not None:
+            _RENDER_CACHE[filename] = digest
+        return result
+
+    @staticmethod
+    def render_many(jobs: List[Tuple[Any, str]]) -> List[str]:
+        """
+        批量渲染 (chart, filename)，返回与 jobs 一一对应的文件名（失败为空串）
+        
+        在当前进程内逐个渲染：单张图表的 render_embed 只需毫秒级，而子进程需重新导入调用方的
+        依赖（检索/模型库），启动开销远大于渲染本身。内容未变的图表命中缓存，直接跳过。
+        """
+        return [VisualizerTools.render_chart_to_file(chart, filename) for chart, filename in jobs]
+
+
+def _write_chart(job: Tuple[Any, str]) -> str:
+    """渲染单张图表并写盘"""
+    chart, filename = job
+    try:
+        # 确保目录存在
+        os.makedirs(os.path.dirname(filename), exist_ok=True)
+        # 先在内存中得到完整 HTML，再经 1 MiB 缓冲一次写出，多 MB 的页面不必分多次小块写盘
+        html = chart.render_embed()
+        with open(filename, 'w', encoding='utf-8', buffering=1 << 20) as f:
+            f.write(html)
+        logger.info(f"✅ Chart rendered to {filename}")
+        return filename
+    except Exception as e:
+        logger.error(f"Failed to render chart: {e}")
+        return ""